@@ -1,24 +1,68 @@
 import hashlib
 import json
+import logging
+import random
 from functools import wraps
+from itertools import takewhile
 from time import time
 from uuid import uuid4
 
 from flask import Flask, jsonify, request, render_template
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from decouple import config
+from decouple import config, Csv
+from itsdangerous import URLSafeTimedSerializer, BadData
+from sqlalchemy import create_engine
 
 from .room import Room, Store
 from .player import Player
 from .world import World
-from .blueprints import items_blueprint, users_blueprint, rooms_blueprint, worlds_blueprint
-
-from .models import DB, Users, Items, Worlds, Rooms
-
-
-def create_app():
-
-    def room_update(player, chatmessage, chat_only=False):
+from .registry import WorldRegistry
+from .ids import IdAllocator
+from .write_behind import ItemWriter
+from .inventory_reset import InventoryResetter
+from .checkpoint import PlayerCheckpointer
+from .encoding import COMPACT, pack_room
+from .metrics import Metrics
+from .leaderboard import Leaderboard
+from .passwords import PasswordHasher
+from .partition import Partition
+from .message_queue import LocalMessageQueue
+from .blueprints import items_blueprint, users_blueprint, rooms_blueprint, worlds_blueprint, metrics_blueprint
+
+from .models import DB, Users, Items, Worlds, Rooms, IdBlocks, add_missing_columns, add_missing_indexes, reserve_ids, pool_options
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(metrics=None, partition=None, client_manager=None):
+    """
+    Builds the app and its socket handlers.
+
+    metrics        → a `Metrics` instance (or subclass) to record socket
+                     events with. A new `Metrics()` is used if not given.
+    partition      → the `Partition` of the world this worker runs.
+                     Read from WORKER_INDEX/WORKER_COUNT/... if not given.
+    client_manager → a socketio client manager (message queue) to share
+                     broadcasts with other workers. Built from
+                     SOCKETIO_MESSAGE_QUEUE if not given.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    if partition is None:
+        partition = Partition(config('WORKER_INDEX', default=0, cast=int),
+                              config('WORKER_COUNT', default=1, cast=int),
+                              config('REGION_SIZE', default=8, cast=int),
+                              config('WORKER_URLS', default='', cast=Csv()))
+    if client_manager is None:
+        # A Redis/RabbitMQ URL, "local" for LocalMessageQueue, or nothing
+        message_queue = config('SOCKETIO_MESSAGE_QUEUE', default=None)
+        if message_queue == 'local':
+            client_manager = LocalMessageQueue()
+    else:
+        message_queue = None
+    # Fraction of socket events written to the DEBUG log
+    log_sample_rate = config('SOCKET_LOG_SAMPLE_RATE', default=0.01, cast=float)
+
+    def room_update(player, chatmessage, chat_only=False, since=None, entered=False):
         """
         Emits info via socket to all players
         in the same room as the given player.
@@ -27,18 +71,105 @@ def create_app():
         to update all players in room simulatneously.
             Player      → Player who just performed action
             chatmessage → message for FE chat
+            since       → room version before the action. Sockets that
+                          asked for deltas get a "roomdelta" from it,
+                          or a full "roomupdate" if that's not possible
+            entered     → the player just entered the room. They get
+                          a full "roomupdate", everyone else a delta
         """
+        world, room = player.world, player.current_room
+        full_room  = world.socket_room(player.world_loc)
+        delta_room = world.socket_room(player.world_loc, deltas=True)
+        recipients = [socketio.server.manager.get_participants('/', r)
+                      for r in (full_room, delta_room)]
+        metrics.record_emit(sum(len(list(r)) for r in recipients))
+
         response = {
-            'room': None if chat_only else player.current_room.serialize(),
+            'room': None if chat_only else room.serialize(),
             'chat': chatmessage
         }
-        return emit("roomupdate", response, room=str(player.world_loc))
+        # Compact sockets get their own snapshot when entering
+        emit("roomupdate", response, room=full_room,
+             include_self=not (entered and request.sid in compact_sids))
+        if chat_only:
+            return emit("roomupdate", response, room=delta_room)
+
+        delta = room.delta_since(room.version if entered else since) \
+            if entered or since is not None else None
+        if entered and (request.sid in delta_sids or request.sid in compact_sids):
+            emit("roomupdate", {'room': room_snapshot(room), 'chat': chatmessage})
+        if delta is None:
+            return emit("roomupdate", response, room=delta_room, include_self=not entered)
+        delta['chat'] = chatmessage
+        if entered:
+            delta['entered'] = player.username
+        return emit("roomdelta", delta, room=delta_room, include_self=not entered)
+
+    def room_snapshot(room):
+        """The room for this socket alone, in the encoding it connected with."""
+        if request.sid in compact_sids:
+            return pack_room(room.serialize())
+        return room.serialize()
+
+    def room_left(player, world_loc):
+        """Tells delta sockets in the room the player was in that they left."""
+        room = player.world.rooms.get(world_loc)
+        if room is None:
+            return
+        delta = room.delta_since(room.version)
+        delta['chat'] = f"{player.username} left the room"
+        delta['left'] = player.username
+        emit("roomdelta", delta, room=player.world.socket_room(world_loc, deltas=True),
+             include_self=False)
+
+    def join_room_of(player):
+        """Joins the socket room for the player's room, for its kind of updates."""
+        join_room(player.world.socket_room(player.world_loc, request.sid in delta_sids))
+
+    def leave_room_of(player):
+        leave_room(player.world.socket_room(player.world_loc, request.sid in delta_sids))
+
+    def log_socket_info(sid, data=None, level=logging.DEBUG):
+        """
+        Logs a socket event. DEBUG messages are only
+        logged for a sample of events (SOCKET_LOG_SAMPLE_RATE).
+        """
+        if not logger.isEnabledFor(level):
+            return
+        if level <= logging.DEBUG and random.random() >= log_sample_rate:
+            return
+        logger.log(level, "%s %s", sid, data if data else "")
+
+    def hand_off(player, world_loc):
+        """
+        Moves the player into a room owned by another worker.
 
-    def print_socket_info(sid, data=None):
-        print(f"\n{sid}")
-        if data:
-            print(data)
-        print()
+        Tells the room they left, saves the player at the new room
+        and removes them from this worker, then emits 'redirect' with
+        the other worker's URL and a short-lived token to log in there with.
+        """
+        if item_writer is not None:
+            # The other worker loads the player's items from the DB
+            item_writer.flush()
+        leave_room_of(player)
+        # Full sockets get the departure as chat, delta sockets as a delta
+        emit("roomupdate", {'room': None, 'chat': f"{player.username} left the room"},
+             room=player.world.socket_room(player.world_loc))
+        room_left(player, player.world_loc)
+        player.world_loc = world_loc
+        registry.save_player(player)
+        owner = partition.owner(world_loc)
+        return emit('redirect', {
+            'worker': owner,
+            'redirect': partition.url(owner),
+            'token': handoff_tokens.dumps(player.username)
+        })
+
+    def on(event):
+        """`@socketio.on(event)`, with the handler recorded by `metrics`"""
+        def decorator(f):
+            return socketio.on(event)(metrics.instrument(event)(f))
+        return decorator
 
     def player_in_world(f):
         """
@@ -49,8 +180,9 @@ def create_app():
         """
         @wraps(f)
         def handler(*args, **kwargs):
-            player = world.get_player_by_auth(request.sid)
+            player = registry.get_player_by_auth(request.sid)
             if player is None:
+                metrics.record_rejected('no_player')
                 response = {'error': 'No player found in world'}
                 return emit('noPlayer', response)
             else:
@@ -70,13 +202,39 @@ def create_app():
         @wraps(f)
         def handler(player, *args, **kwargs):
             if not player.admin_q:
+                metrics.record_rejected('not_admin')
                 response = {'error': "User not authorized"}
                 return emit('noAdmin', response)
             else:
                 return f(player, *args, **kwargs)
         return handler
 
-    world = World()
+    def setup_world(world):
+        """Gives a world this app's shared writer, hasher and partition."""
+        world.item_writer = item_writer
+        world.item_ids    = item_ids
+        world.hasher      = hasher
+        world.partition   = partition
+        # Highscore changes are sent out at most every 500ms
+        # With several workers, each reloads the others' highscores every 5s
+        world.leaderboard = Leaderboard(config('LEADERBOARD_SIZE', default=3, cast=int),
+                                        refresh_interval=5 if partition.partitioned else None,
+                                        room=world.socket_room())
+        world.leaderboard.start(socketio, app)
+
+    def reserve_item_ids(count):
+        with app.app_context():
+            # Not from the request path's pool: the caller may be holding one
+            return reserve_ids(Items, count, app.extensions.get('dungeon_background_engine'))
+
+    # Item ids are reserved from the DB a block at a time
+    item_ids = IdAllocator(reserve_item_ids)
+    registry = WorldRegistry(setup_world, item_ids)
+    hasher   = PasswordHasher()
+    # Sockets that asked for "roomdelta" updates in 'init'
+    delta_sids = set()
+    # Sockets that connected with "?encoding=compact"
+    compact_sids = set()
 
     app = Flask(__name__)
 
@@ -86,8 +244,59 @@ def create_app():
     # Stop tracking modifications on sqlalchemy config
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-    socketio = SocketIO(app, cors_allowed_origins="*")
+    # Connection pool for the request path
+    pool_timeout  = config('DB_POOL_TIMEOUT', default=10, cast=float)
+    pool_recycle  = config('DB_POOL_RECYCLE', default=1800, cast=int)
+    pool_pre_ping = config('DB_POOL_PRE_PING', default=True, cast=bool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = pool_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        size=config('DB_POOL_SIZE', default=10, cast=int),
+        overflow=config('DB_MAX_OVERFLOW', default=10, cast=int),
+        timeout=pool_timeout, recycle=pool_recycle, pre_ping=pool_pre_ping)
+    # Background persistence gets a small pool of its own. 0 → shares the main pool
+    background_pool_size = config('DB_BACKGROUND_POOL_SIZE', default=2, cast=int)
+
+    if partition.partitioned:
+        # Every worker must share it, to accept each other's hand-off tokens
+        app.config['SECRET_KEY'] = config('SECRET_KEY')
+    handoff_tokens = URLSafeTimedSerializer(app.config.get('SECRET_KEY') or uuid4().hex,
+                                            salt='handoff')
+
+    if client_manager is not None:
+        socketio = SocketIO(app, cors_allowed_origins="*", client_manager=client_manager)
+    else:
+        socketio = SocketIO(app, cors_allowed_origins="*", message_queue=message_queue)
     DB.init_app(app)
+    app.extensions['dungeon_metrics'] = metrics
+    app.extensions['dungeon_worlds']  = registry
+
+    with app.app_context():
+        metrics.watch_engine(DB.engine)
+        metrics.watch_pool(DB.engine, 'main')
+        url = DB.engine.url
+        # An in-memory SQLite database only exists for its own engine
+        in_memory = url.drivername.startswith('sqlite') and url.database in (None, '', ':memory:')
+        if background_pool_size > 0 and not in_memory:
+            background_engine = create_engine(url, **pool_options(
+                str(url),
+                size=background_pool_size,
+                overflow=config('DB_BACKGROUND_MAX_OVERFLOW', default=2, cast=int),
+                timeout=pool_timeout, recycle=pool_recycle, pre_ping=pool_pre_ping))
+            metrics.watch_engine(background_engine)
+            metrics.watch_pool(background_engine, 'background')
+            app.extensions['dungeon_background_engine'] = background_engine
+
+    # Item ownership changes are batched and written in the background
+    item_writer = ItemWriter(app)
+    item_writer.start(socketio)
+    # Rooms get new items in the background, not when someone walks in
+    inventory_resetter = InventoryResetter(
+        app, registry, config('INVENTORY_RESET_INTERVAL', default=30, cast=float))
+    inventory_resetter.start(socketio)
+    # Online players are saved in batches, not only when they disconnect
+    player_checkpointer = PlayerCheckpointer(
+        app, registry, config('PLAYER_CHECKPOINT_INTERVAL', default=60, cast=float))
+    player_checkpointer.start(socketio)
 
     with app.app_context():
         # Create Tables if they don't already exist
@@ -95,9 +304,26 @@ def create_app():
         Rooms.__table__.create(DB.engine, checkfirst=True)
         Users.__table__.create(DB.engine, checkfirst=True)
         Items.__table__.create(DB.engine, checkfirst=True)
-        # Loads our world if it exists
-        world.load_from_db(DB)
-
+        IdBlocks.__table__.create(DB.engine, checkfirst=True)
+        add_missing_columns(Worlds)
+        add_missing_columns(Rooms)
+        add_missing_columns(Users)
+        for model in [Users, Rooms, Items]:
+            add_missing_indexes(model)
+        # Loads our worlds if they exist
+        registry.load_from_db(DB)
+        for _ in range(60):
+            if registry.main is not None or partition.index == 0:
+                break
+            # Worker 0 creates the world. Wait for it
+            socketio.sleep(1)
+            registry.load_from_db(DB)
+
+        if registry.main is None:
+            world = World()
+            setup_world(world)
+            registry.add(world)
+        world = registry.main
         if len(world.rooms) == 0:
             # If the world is empty, creates one
             world.create_world()
@@ -106,10 +332,10 @@ def create_app():
             # If we have no users, start with our admin user
             username = config("ADMIN_USERNAME")
             password = config("ADMIN_PASSWORD")
-            quth = world.add_player(username, password, password)
+            quth = registry.add_player(username, password, password)
             if 'key' in quth:
-                player = world.get_player_by_auth(quth['key'])
-                world.save_player_to_db(player)
+                player = registry.get_player_by_auth(quth['key'])
+                registry.save_player(player)
 
     @app.after_request
     def after_request(response):
@@ -125,6 +351,7 @@ def create_app():
     app.register_blueprint(users_blueprint.blueprint)
     app.register_blueprint(rooms_blueprint.blueprint)
     app.register_blueprint(worlds_blueprint.blueprint)
+    app.register_blueprint(metrics_blueprint.blueprint)
 
     def get_player_by_header(world, auth_header):
         if auth_header is None:
@@ -137,21 +364,26 @@ def create_app():
         player = world.get_player_by_auth(auth_key[1])
         return player
 
-    @socketio.on("connect")
+    @on("connect")
     def connect():
-        print_socket_info(request.sid, "Joined the server.")
+        log_socket_info(request.sid, "Joined the server.", logging.INFO)
+        # "?encoding=compact" → packed 'mapinfo' and room snapshots
+        if request.args.get('encoding') == COMPACT:
+            compact_sids.add(request.sid)
         emit("connected", "hello")
 
-    @socketio.on("disconnect")
+    @on("disconnect")
     def disconnect():
-        print_socket_info(request.sid, "Left the server.")
-        player = world.get_player_by_auth(request.sid)
+        log_socket_info(request.sid, "Left the server.", logging.INFO)
+        delta_sids.discard(request.sid)
+        compact_sids.discard(request.sid)
+        player = registry.get_player_by_auth(request.sid)
         if player is not None:
-            world.save_player_to_db(player)
+            registry.save_player(player)
 
-    @socketio.on("test")
+    @on("test")
     def test(data):
-        print_socket_info(request.sid, data)
+        log_socket_info(request.sid, data)
         emit("test", data)
 
     @app.route('/')
@@ -160,11 +392,23 @@ def create_app():
 
     @app.route('/socketoptions')
     def socket_options():
-        return jsonify(["register", "login", "test", "init", "move", "take", "drop", "chat"]), 200
+        return jsonify(["register", "login", "test", "init", "move", "take", "drop", "chat",
+                        "roomsync", "travel_to"]), 200
+
+    @app.route('/api/route/<username>')
+    def route(username):
+        # Which worker a user should connect to
+        user = Users.query.filter_by(username=username).first()
+        if user is None:
+            return jsonify({'error': 'Invalid username'}), 404
+        owner = partition.owner((user.x, user.y))
+        return jsonify({'worker': owner, 'url': partition.url(owner)}), 200
 
     @app.route('/api/check')
     def check():
         # Check if server is running and load world.
+        # Only rebuilds the main world. See /api/models/world for event worlds
+        world = registry.main
         value = request.get_json()
         world.create_world(value.get('seed'))
         world.save_to_db(DB)
@@ -178,9 +422,9 @@ def create_app():
 
         return jsonify({'message': 'World is up and running'}), 200
 
-    @socketio.on('register')
+    @on('register')
     def register(data=None, *_, **__):
-        print_socket_info(request.sid, data)
+        log_socket_info(request.sid, data)
         required = ['username', 'password1', 'password2']
 
         if not data or not all(k in data for k in required):
@@ -192,111 +436,192 @@ def create_app():
         password1 = data.get('password1')
         password2 = data.get('password2')
 
-        response = world.add_player(
-            username, password1, password2, request.sid)
+        response = registry.add_player(
+            username, password1, password2, request.sid, data.get('world'))
         if 'error' in response:
             return emit('registerError', response)
         else:
             return emit('register', response)
 
-    @socketio.on('login')
+    @on('login')
     def login(data=None, *_, **__):
-        print_socket_info(request.sid, data)
+        log_socket_info(request.sid, data)
 
         if not data:
             response = {'error': 'Please provide a username and password'}
+        elif 'token' in data:
+            # Handed off by another worker (see `hand_off`)
+            try:
+                username = handoff_tokens.loads(data['token'], max_age=60)
+                response = registry.load_player_from_db(username, None, request.sid,
+                                                        trusted=True)
+            except BadData:
+                response = {'error': 'Invalid or expired token'}
         else:
-            response = world.load_player_from_db(data.get('username'),
-                                                 data.get('password'),
-                                                 request.sid)
-
-        if 'error' in response:
+            response = registry.load_player_from_db(data.get('username'),
+                                                    data.get('password'),
+                                                    request.sid,
+                                                    world_id=data.get('world'))
+
+        if 'redirect' in response:
+            return emit('redirect', response)
+        elif 'error' in response:
             return emit('loginError', response)
         else:
             return emit('login', response)
 
-    @socketio.on('debug')
+    @on('debug')
     @player_in_world
     @player_is_admin
     def debug(player, *_, **__):
-        print_socket_info(request.sid)
+        log_socket_info(request.sid)
         response = {'message': "Authority accepted."}
         return emit('debug', response)
 
-    @socketio.on('debug/save')
+    @on('debug/save')
     @player_in_world
     @player_is_admin
     def save(player, *_, **__):
-        print_socket_info(request.sid)
-        world.save_to_db(DB)
+        log_socket_info(request.sid)
+        # Only writes what changed. A full resave happens in /api/check
+        rows = player.world.flush_changes(DB)
 
-        response = {'message': "Successfully saved world."}
+        response = {'message': f"Successfully saved world ({rows} changes)."}
         return emit('debug/save', response)
 
-    @socketio.on('debug/load')
+    @on('debug/load')
     @player_in_world
     @player_is_admin
     def load(player, *_, **__):
-        print_socket_info(request.sid)
-        world.load_from_db(DB)
+        log_socket_info(request.sid)
+        player.world.load_from_db(DB)
 
         response = {'message': "Successfully loaded world."}
         return emit('debug/load', response)
 
-    @socketio.on('debug/reset')
+    @on('debug/reset')
     @player_in_world
     @player_is_admin
     def reset(player, *_, **__):
-        print_socket_info(request.sid)
-        world.create_world()
+        log_socket_info(request.sid)
+        player.world.create_world()
 
         response = {'message': "Successfully reset world."}
         return emit('debug/reset', response)
 
-    @socketio.on('init')
+    @on('init')
     @player_in_world
-    def init(player, *_, **__):
-        print_socket_info(request.sid)
+    def init(player, data=None, *_, **__):
+        log_socket_info(request.sid, data)
+
+        # {"deltas": true} → room changes are sent as "roomdelta"
+        if isinstance(data, dict) and data.get('deltas'):
+            delta_sids.add(request.sid)
 
         # Send map and highscore information
-        response = player.world.get_map_info(),
+        if request.sid in compact_sids:
+            response = player.world.get_packed_map_info(),
+        else:
+            response = player.world.get_map_info(),
         highscoreupdate = player.world.confirm_highscores(
             player, single_socket=True)
         emit("highscoreupdate", highscoreupdate)
         emit('mapinfo', response)
         emit('playerupdate', player.serialize())
         # Send current room information
-        join_room(str(player.world_loc))
+        join_room(player.world.socket_room())
+        join_room_of(player)
         chatmessage = f"{player.username} entered the room"
-        return room_update(player, chatmessage)
+        return room_update(player, chatmessage, entered=True)
+
+    @on('roomsync')
+    @player_in_world
+    def room_sync(player, *_, **__):
+        # For delta clients that missed a version
+        log_socket_info(request.sid)
+        response = {'room': room_snapshot(player.current_room), 'chat': None}
+        return emit('roomupdate', response)
 
-    @socketio.on('move')
+    @on('move')
     @player_in_world
     def move(player, direction=None, *_, **__):
-        print_socket_info(request.sid, direction)
+        log_socket_info(request.sid, direction)
 
         if direction is None or not isinstance(direction, str) or direction not in "nsew":
             return emit("moveError", {
                 "error": "You must move a direction: 'n', 's', 'e', 'w'"})
 
-        previous_room = str(player.world_loc)
+        previous_loc = player.world_loc
+
+        next_room = player.current_room.get_room_in_direction(direction)
+        if next_room is not None and not partition.owns(next_room.world_loc):
+            # Another worker runs that room
+            return hand_off(player, next_room.world_loc)
 
         if player.travel(direction):
             # If the player travels successfully
-            leave_room(previous_room)
-            join_room(str(player.world_loc))
+            leave_room(player.world.socket_room(previous_loc, request.sid in delta_sids))
+            room_left(player, previous_loc)
+            join_room_of(player)
             chatmessage = f"{player.username} entered the room"
-            return room_update(player, chatmessage)
+            return room_update(player, chatmessage, entered=True)
         else:
             response = {
                 'error': "You cannot move in that direction.",
             }
             return emit("moveError", response)
 
-    @socketio.on('take')
+    @on('travel_to')
+    @player_in_world
+    def travel_to(player, data=None, *_, **__):
+        """
+        Walks the player to a room in one event, along the shortest path:
+            {"x": int, "y": int} → that room
+            {"store": true}      → the nearest store
+        Emits 'travelled' with the rooms walked through. Only the
+        departure and the arrival are broadcast.
+        """
+        log_socket_info(request.sid, data)
+
+        bad_format = {
+            'error': 'Please provide where to travel to.',
+            'required': '{"x": int, "y": int} or {"store": true}'
+        }
+        if not isinstance(data, dict):
+            return emit('travelError', bad_format)
+
+        world = player.world
+        if data.get('store') is True:
+            path = world.path_to_store(player.world_loc)
+        elif isinstance(data.get('x'), int) and isinstance(data.get('y'), int):
+            path = world.find_path(player.world_loc, (data['x'], data['y']))
+        else:
+            return emit('travelError', bad_format)
+
+        if path is None:
+            return emit('travelError', {'error': "There is no way there."})
+        if not path:
+            return emit('travelError', {'error': "You are already there."})
+
+        owned = len(list(takewhile(partition.owns, path)))
+        if owned < len(path):
+            # Another worker runs the rest of the way. The client can ask it to go on
+            emit('travelled', {'path': path[:owned + 1]})
+            return hand_off(player, path[owned])
+
+        previous_loc = player.world_loc
+        player.travel_to(path[-1])
+        emit('travelled', {'path': path})
+        leave_room(world.socket_room(previous_loc, request.sid in delta_sids))
+        room_left(player, previous_loc)
+        join_room_of(player)
+        chatmessage = f"{player.username} entered the room"
+        return room_update(player, chatmessage, entered=True)
+
+    @on('take')
     @player_in_world
     def take_item(player, item_id=None, *_, **__):
-        print_socket_info(request.sid, f"take {item_id}")
+        log_socket_info(request.sid, f"take {item_id}")
 
         if item_id is None or not isinstance(item_id, int):
             return emit("takeError", {
@@ -305,10 +630,11 @@ def create_app():
         if isinstance(player.current_room, Store):
             return emit("takeError", {"error": "You must barter at the store"})
 
+        before      = player.current_room.version
         chatmessage = player.take_item(item_id)
         if chatmessage:
             emit("playerupdate", player.serialize())
-            return room_update(player, chatmessage)
+            return room_update(player, chatmessage, since=before)
         elif chatmessage is None:
             response = {
                 'error': 'This item is not in the room'
@@ -320,29 +646,30 @@ def create_app():
             }
             return emit('full', response)
 
-    @socketio.on('drop')
+    @on('drop')
     @player_in_world
     def drop_item(player, item_id=None, *_, **__):
-        print_socket_info(request.sid, f"drop {item_id}")
+        log_socket_info(request.sid, f"drop {item_id}")
 
         if item_id is None or not isinstance(item_id, int):
             return emit("takeError", {
                 "error": "You must provide a valid item_id integer"})
 
+        before      = player.current_room.version
         chatmessage = player.drop_item(item_id)
         if chatmessage:
             emit("playerupdate", player.serialize())
-            return room_update(player, chatmessage)
+            return room_update(player, chatmessage, since=before)
         else:
             response = {
                 'error': 'You don\'t have this item'
             }
             emit('dropError', response)
 
-    @socketio.on('chat')
+    @on('chat')
     @player_in_world
     def inventory(player, message=None, *_, **__):
-        print_socket_info(request.sid, f"CHAT: {message}")
+        log_socket_info(request.sid, f"CHAT: {message}")
 
         if message is None or not isinstance(message, str):
             return emit("chatError", {
@@ -350,16 +677,16 @@ def create_app():
 
         room_update(player, f"{player.username}: {message}", chat_only=True)
 
-    @socketio.on('inventory')
+    @on('inventory')
     def inventory():
         # IMPLEMENT THIS
         response = {'error': "Not implemented"}
         return emit('error', response)
 
-    @socketio.on('barter')
+    @on('barter')
     @player_in_world
     def barter_item(player, data=None, *_, **__):
-        print_socket_info(request.sid, data)
+        log_socket_info(request.sid, data)
 
         bad_format = {
                 'error': 'Please provide a valid data dictionary.',
@@ -371,7 +698,7 @@ def create_app():
 
         player_item_ids = data.get('player_item_ids')
         store_item_id   = data.get('store_item_id')
-        store = world.rooms.get(tuple(player.world_loc))
+        store = player.world.rooms.get(tuple(player.world_loc))
 
         if not store or not isinstance(store, Store):
             response = {
@@ -386,6 +713,7 @@ def create_app():
             if not isinstance(id, int):
                 return emit('barterError', bad_format)
 
+        before   = store.version
         response = player.barter(player_item_ids, store_item_id)
         if 'error' in response:
             if 'full' in response:
@@ -397,15 +725,15 @@ def create_app():
                 return emit('barterError', response)
         
         emit('playerupdate', player.serialize())
-        return room_update(player, response.get('chat'))
+        return room_update(player, response.get('chat'), since=before)
 
-    @socketio.on('sell')
+    @on('sell')
     def sell_item():
         # IMPLEMENT THIS
         response = {'error': "Not implemented"}
         return emit('error', response)
 
-    @socketio.on('rooms')
+    @on('rooms')
     def rooms():
         # IMPLEMENT THIS
         response = {'error': "Not implemented"}
@@ -1,15 +1,18 @@
 from flask import Blueprint, jsonify
 from ..models import Items
 from .middleware import admin_only
+from .listing import list_rows
 
 blueprint = Blueprint('items', __name__, url_prefix="/api/models/items")
 
+# What `Items.serialize()` returns, for ?fields=
+FIELDS = ['id', 'name', 'weight', 'score', 'player_id', 'room_id']
+
 
 @blueprint.route('/', methods=['GET'])
 @admin_only
 def get_all():
-    items = Items.query.all()
-    return jsonify([item.serialize() for item in items]), 200
+    return list_rows(Items, FIELDS)
 
 
 @blueprint.route('/<item_id>', methods=['GET'])
@@ -0,0 +1,70 @@
+import json
+from flask import Response, jsonify, request, stream_with_context, url_for
+from sqlalchemy.orm import selectinload
+from ..models import DB
+
+# Rows per page without ?limit, and the most one page (or NDJSON batch) holds
+DEFAULT_LIMIT = 100
+MAX_LIMIT     = 1000
+
+
+def list_rows(model, fields):
+    """
+    Lists a model's rows, by id, for an admin GET.
+
+    Query string:
+        ?limit=100      → rows per page, at most MAX_LIMIT
+        ?after=<id>     → only rows with a greater id (keyset pagination).
+                          If there may be more, the `Link` header
+                          has the next page's URL
+        ?fields=id,name → only these fields
+        ?format=ndjson  → every row after `after`, streamed as one
+                          JSON object per line, MAX_LIMIT rows at a time
+
+    fields → the fields `serialize()` returns, in order. Relationships
+             among them are loaded with one extra query per page.
+    """
+    try:
+        limit = min(int(request.args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        after = int(request.args.get('after', 0))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        return jsonify({'error': 'limit and after must be integers, limit at least 1'}), 400
+
+    selected = fields
+    if 'fields' in request.args:
+        selected = [f for f in request.args['fields'].split(',') if f]
+        if not selected or any(f not in fields for f in selected):
+            return jsonify({'error': 'Unknown fields', 'fields': fields}), 400
+    relations = [f for f in selected if f in model.__mapper__.relationships]
+
+    def page(after, limit):
+        query = model.query.filter(model.id > after).order_by(model.id)
+        for relation in relations:
+            query = query.options(selectinload(getattr(model, relation)))
+        return query.limit(limit).all()
+
+    def row_dict(row):
+        return {f: [r.serialize() for r in getattr(row, f)] if f in relations else getattr(row, f)
+                for f in selected}
+
+    if request.args.get('format') == 'ndjson':
+        def stream(after):
+            while True:
+                rows = page(after, MAX_LIMIT)
+                for row in rows:
+                    yield json.dumps(row_dict(row)) + "\n"
+                if len(rows) < MAX_LIMIT:
+                    return
+                after = rows[-1].id
+                # Only one batch of rows in memory at a time
+                DB.session.expunge_all()
+        return Response(stream_with_context(stream(after)), mimetype='application/x-ndjson')
+
+    rows = page(after, limit)
+    response = jsonify([row_dict(row) for row in rows])
+    if len(rows) == limit:
+        args = {**request.args.to_dict(), 'after': rows[-1].id, 'limit': limit}
+        response.headers['Link'] = f'<{url_for(request.endpoint, **args)}>; rel="next"'
+    return response, 200
@@ -0,0 +1,11 @@
+from flask import Blueprint, current_app
+from .middleware import admin_only
+
+blueprint = Blueprint('metrics', __name__, url_prefix="/api/metrics")
+
+
+@blueprint.route('/', methods=['GET'])
+@admin_only
+def get():
+    metrics = current_app.extensions['dungeon_metrics']
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4'}
@@ -1,14 +1,17 @@
 from flask import Blueprint, jsonify, request
 from ..models import Rooms
 from .middleware import admin_only
+from .listing import list_rows
 
 blueprint = Blueprint('rooms', __name__, url_prefix="/api/models/rooms")
 
+# What `Rooms.serialize()` returns, for ?fields=
+FIELDS = ['id', 'name', 'description', 'x', 'y', 'world_id', 'items']
+
 @blueprint.route('/', methods=['GET'])
 @admin_only
 def get_all():
-    rooms = Rooms.query.all()
-    return jsonify([room.serialize() for room in rooms]), 200
+    return list_rows(Rooms, FIELDS)
 
 
 @blueprint.route('/<room_id>', methods=['GET'])
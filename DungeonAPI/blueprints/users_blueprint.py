@@ -1,15 +1,18 @@
 from flask import Blueprint, jsonify
 from ..models import Users
 from .middleware import admin_only
+from .listing import list_rows
 
 blueprint = Blueprint('users', __name__, url_prefix="/api/models/users")
 
+# What `Users.serialize()` returns, for ?fields=
+FIELDS = ['id', 'username', 'admin_q', 'x', 'y', 'highscore', 'world_id', 'items']
+
 
 @blueprint.route('/', methods=['GET'])
 @admin_only
 def get_all():
-    users = Users.query.all()
-    return jsonify([user.serialize() for user in users]), 200
+    return list_rows(Users, FIELDS)
 
 
 @blueprint.route('/<user_id>', methods=['GET'])
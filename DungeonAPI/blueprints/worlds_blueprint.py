@@ -1,5 +1,5 @@
-from flask import Blueprint, jsonify, request
-from ..models import Worlds
+from flask import Blueprint, current_app, jsonify, request
+from ..models import DB, Worlds
 from .middleware import admin_only
 
 blueprint = Blueprint('world', __name__, url_prefix="/api/models/world")
@@ -8,4 +8,27 @@ blueprint = Blueprint('world', __name__, url_prefix="/api/models/world")
 @admin_only
 def get():
     worlds = Worlds.query.all()
-    return jsonify([world.serialize() for world in worlds]), 200
\ No newline at end of file
+    return jsonify([world.serialize() for world in worlds]), 200
+
+@blueprint.route('/', methods=['POST'])
+@admin_only
+def create():
+    # Starts a new (event) world next to the running ones
+    value = request.get_json(silent=True) or {}
+    options = {k: value[k] for k in ['size', 'room_limit'] if isinstance(value.get(k), int)}
+    registry = current_app.extensions['dungeon_worlds']
+    world = registry.create(DB, value.get('seed'), **options)
+    return jsonify({'id': world.id, 'map_seed': world.map_seed, 'rooms': len(world.rooms)}), 201
+
+@blueprint.route('/<int:world_id>', methods=['DELETE'])
+@admin_only
+def delete(world_id):
+    registry = current_app.extensions['dungeon_worlds']
+    world = registry.get(world_id)
+    if world is None or world is registry.main:
+        return jsonify({'error': 'No such event world'}), 404
+    # Tell the world's players before they're logged out
+    socketio = current_app.extensions['socketio']
+    socketio.emit('worldClosed', {'world': world_id}, room=world.socket_room())
+    registry.remove(DB, world_id)
+    return jsonify({'message': f"World {world_id} removed"}), 200
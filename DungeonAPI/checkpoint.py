@@ -0,0 +1,66 @@
+import atexit
+import logging
+
+from .models import background_session
+
+logger = logging.getLogger(__name__)
+
+
+class PlayerCheckpointer:
+    """
+    Saves online players in the background, so a crash or deploy
+    loses at most `interval` seconds of their progress.
+
+    Every `interval` seconds, a single background task saves every
+    dirty online player of each world with one
+    `World.save_players_to_db()` call per world. When the process
+    exits, every online player is saved the same way.
+
+    worlds → iterable of the Worlds to save (a `WorldRegistry`)
+    """
+
+    def __init__(self, app, worlds, interval=60):
+        self.app      = app
+        self.worlds   = worlds
+        self.interval = interval
+        self.running  = False
+
+    def start(self, socketio):
+        """Starts the background task with socketio's async mode."""
+        if self.running:
+            return
+        self.running = True
+        socketio.start_background_task(self.__run, socketio)
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stops the background task and saves every online player."""
+        if not self.running:
+            return
+        self.running = False
+        self.run_once(everyone=True)
+
+    def run_once(self, everyone=False):
+        """
+        Saves every dirty online player, or every online
+        player if `everyone`. Returns the number saved.
+        """
+        saved = 0
+        with background_session(self.app) as session:
+            for world in list(self.worlds):
+                online  = list(world.players.values())
+                players = online if everyone else [p for p in online
+                                                   if p in world.dirty_players]
+                saved  += world.save_players_to_db(players, session)
+        return saved
+
+    def __run(self, socketio):
+        while self.running:
+            socketio.sleep(self.interval)
+            if not self.running:
+                break
+            try:
+                self.run_once()
+            except Exception:
+                # Keep checkpointing. The players are still dirty next time
+                logger.exception("Checkpointing players failed")
@@ -0,0 +1,186 @@
+import random
+from collections import OrderedDict
+
+from .room import rooms_to_db, rooms_from_db
+from .models import DB, Rooms, reserve_ids
+
+# Place names used for room types without a location name
+PLACES = {'dead-end': "dead end", 'tunnel': "tunnel", 'store': "ant store"}
+
+
+class ChunkedRooms:
+    """
+    Lazily loaded stand-in for `World.rooms` on very large maps.
+
+    The map is split into chunk_size x chunk_size chunks. Only the
+    layout (which coordinates hold which type of room) is kept for the
+    whole map. A chunk's Rooms and items are built the first time one
+    of its rooms is looked up:
+        - from the DB, if the chunk has been loaded before
+        - else from the map seed, and then written to the DB
+
+    At most `max_chunks` chunks stay in memory. Past that, the least
+    recently used chunk without any players in it is dropped, after
+    the world's pending changes are flushed to the DB.
+
+    Supports `in`, `len()`, iteration over coordinates, `get()` and
+    `[]` like a dict. Looking up a room needs an app context.
+
+    first_id → first of the map.size² room ids reserved for this world.
+               Reserved from the DB on first use if not given.
+    """
+
+    def __init__(self, world, map, chunk_size=32, max_chunks=64, first_id=None):
+        self.world      = world
+        self.map        = map
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.first_id   = first_id
+        # layout { key: world_loc, value: room type }
+        self.layout     = {(j, i): room_type for i, j, room_type in map.room_layout()}
+        # chunks { key: chunk key, value: { key: world_loc, value: Room } }
+        # Least recently used first
+        self.chunks     = OrderedDict()
+        self.locations  = list(map.locations)
+
+    def __contains__(self, world_loc):
+        return world_loc in self.layout
+
+    def __len__(self):
+        return len(self.layout)
+
+    def __iter__(self):
+        return iter(self.layout)
+
+    def __getitem__(self, world_loc):
+        if world_loc not in self.layout:
+            raise KeyError(world_loc)
+        return self.load_chunk(self.chunk_key(world_loc))[world_loc]
+
+    def get(self, world_loc, default=None):
+        if world_loc not in self.layout:
+            return default
+        return self.load_chunk(self.chunk_key(world_loc))[world_loc]
+
+    def keys(self):
+        return self.layout.keys()
+
+    def settings(self):
+        """
+        What's needed besides the map seed to build these rooms
+        again, for the worlds row. See `World.load_from_db()`.
+        """
+        return {
+            'size': self.map.size,
+            'room_limit': self.map.room_limit,
+            'chunk_size': self.chunk_size,
+            'max_chunks': self.max_chunks,
+            'first_room_id': self.first_room_id()
+        }
+
+    def loaded_rooms(self):
+        """Returns every Room currently in memory."""
+        return [room for rooms in self.chunks.values() for room in rooms.values()]
+
+    def store_locs(self):
+        return [loc for loc, room_type in self.layout.items() if room_type == 'store']
+
+    def chunk_key(self, world_loc):
+        return (world_loc[0] // self.chunk_size, world_loc[1] // self.chunk_size)
+
+    def first_room_id(self):
+        """
+        Reserves a block of ids for every spot on the map (see
+        `reserve_ids`) the first time it's called. Commits on its own
+        connection, so call it before writing in the session.
+        """
+        if self.first_id is None:
+            self.first_id = reserve_ids(Rooms, self.map.size ** 2)
+        return self.first_id
+
+    def room_id(self, world_loc):
+        """Rooms get fixed ids from their coordinates, so chunks can be written in any order."""
+        return self.first_room_id() + world_loc[1] * self.map.size + world_loc[0]
+
+    def loc_name_at(self, world_loc):
+        """Picks a location name from the coordinates, so it's the same whichever chunk loads first."""
+        x, y = world_loc
+        idx  = (x * 73856093 ^ y * 19349663 ^ self.world.map_seed) % len(self.locations)
+        return self.locations[idx]
+
+    def get_place(self, world_loc):
+        """Returns the place name at world_loc without loading its chunk."""
+        room_type = self.layout.get(world_loc)
+        if room_type is None:
+            return None
+        elif room_type == 'room':
+            return self.loc_name_at(world_loc)["place"]
+        return PLACES[room_type]
+
+    def load_chunk(self, key):
+        rooms = self.chunks.get(key)
+        if rooms is not None:
+            self.chunks.move_to_end(key)
+            return rooms
+
+        self.evict()
+        x0, y0 = key[0] * self.chunk_size, key[1] * self.chunk_size
+        rooms = rooms_from_db(self.world,
+                              Rooms.x >= x0, Rooms.x < x0 + self.chunk_size,
+                              Rooms.y >= y0, Rooms.y < y0 + self.chunk_size)
+        if not rooms:
+            rooms = self.generate_chunk(key)
+            try:
+                rooms_to_db(rooms.values(), renumber=not self.world.item_ids.shared)
+                DB.session.commit()
+            except Exception:
+                DB.session.rollback()
+                raise
+        self.chunks[key] = rooms
+        return rooms
+
+    def generate_chunk(self, key):
+        """
+        Builds the chunk's rooms from the map seed and the chunk's key,
+        so a chunk comes out the same whenever it's first loaded.
+        """
+        state = random.getstate()
+        random.seed(f"{self.world.map_seed}:{key[0]}:{key[1]}")
+        try:
+            rooms = {}
+            x0, y0 = key[0] * self.chunk_size, key[1] * self.chunk_size
+            for y in range(y0, y0 + self.chunk_size):
+                for x in range(x0, x0 + self.chunk_size):
+                    room_type = self.layout.get((x, y))
+                    if room_type is None:
+                        continue
+                    room = self.map.create_room(x, y, room_type, self.world,
+                                                self.loc_name_at((x, y)))
+                    room.id = self.room_id((x, y))
+                    rooms[(x, y)] = room
+            for room in rooms.values():
+                self.map.describe_room(room, self.get_place)
+        finally:
+            random.setstate(state)
+        return rooms
+
+    def evict(self):
+        """Drops the least recently used chunk without players, if we're full."""
+        if len(self.chunks) < self.max_chunks:
+            return
+        occupied = {self.chunk_key(p.world_loc) for p in self.world.players.values()}
+        for key in self.chunks:
+            if key not in occupied:
+                break
+        else:
+            # Every loaded chunk has players in it
+            return
+
+        if self.world.item_writer is not None:
+            self.world.item_writer.flush()
+        self.world.flush_changes(DB)
+        del self.chunks[key]
+
+    def unload_all(self):
+        """Drops every chunk from memory WITHOUT saving changes."""
+        self.chunks = OrderedDict()
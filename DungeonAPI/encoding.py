@@ -0,0 +1,71 @@
+"""
+Compact forms of the biggest socket payloads, for clients that
+connect with "?encoding=compact".
+
+Every other client keeps getting the plain JSON payloads.
+"""
+
+COMPACT = 'compact'
+
+# Column order of each item row in `pack_room()`
+ITEM_FIELDS = ['x', 'y', 'id', 'name', 'description', 'weight', 'score']
+
+
+def pack_map(map_info):
+    """
+    Packs `World.get_map_info()` into a bitmap of the map's bounding box:
+        {
+            'encoding': 'bitmap',
+            'origin': [min x, min y], 'width': w, 'height': h,
+            'rooms':  bytes, bit (y - min y) * w + (x - min x)
+                      is set where a room is (lowest bit first),
+            'stores': [x0, y0, x1, y1, ...]
+        }
+    The bytes go out as a binary attachment, not as JSON.
+    """
+    rooms = list(map_info['rooms'])
+    if not rooms:
+        return {'encoding': 'bitmap', 'origin': [0, 0], 'width': 0, 'height': 0,
+                'rooms': b'', 'stores': []}
+
+    min_x  = min(x for x, _ in rooms)
+    min_y  = min(y for _, y in rooms)
+    width  = max(x for x, _ in rooms) - min_x + 1
+    height = max(y for _, y in rooms) - min_y + 1
+    bitmap = bytearray((width * height + 7) // 8)
+    for x, y in rooms:
+        bit = (y - min_y) * width + (x - min_x)
+        bitmap[bit >> 3] |= 1 << (bit & 7)
+
+    return {
+        'encoding': 'bitmap',
+        'origin': [min_x, min_y],
+        'width': width,
+        'height': height,
+        'rooms': bytes(bitmap),
+        'stores': [c for loc in map_info['stores'] for c in loc]
+    }
+
+
+def unpack_map(packed):
+    """Turns `pack_map()`'s result back into `get_map_info()`'s form."""
+    min_x, min_y = packed['origin']
+    width, bitmap = packed['width'], packed['rooms']
+    rooms = [(min_x + bit % width, min_y + bit // width)
+             for bit in range(len(bitmap) * 8)
+             if bitmap[bit >> 3] >> (bit & 7) & 1]
+    stores = packed['stores']
+    return {"rooms": rooms, "stores": list(zip(stores[::2], stores[1::2]))}
+
+
+def pack_room(room):
+    """
+    Packs `Room.serialize()`'s result. Items become rows of
+    ITEM_FIELDS values instead of dicts repeating every key:
+        { ..., 'fields': ITEM_FIELDS, 'items': [[x, y, id, ...], ...] }
+    """
+    packed = {key: value for key, value in room.items() if key != 'items'}
+    packed['fields'] = ITEM_FIELDS
+    packed['items']  = [[x, y] + [item[field] for field in ITEM_FIELDS[2:]]
+                        for (x, y), item in room['items']]
+    return packed
@@ -0,0 +1,40 @@
+from threading import Lock
+
+
+class IdAllocator:
+    """
+    Hands out unique ids for new rows, a block at a time, so rows
+    can be INSERTed with their ids and never read back.
+
+    reserve → reserve(count) returns the first id of a new block of
+              `count` ids, that no one else will use
+              (see `models.reserve_ids`).
+              Without it, ids just count up from 1. Only for
+              worlds that are never saved.
+
+    Call the allocator to get an id.
+    """
+
+    def __init__(self, reserve=None, block_size=1000):
+        self.reserve    = reserve
+        self.block_size = block_size
+        self.__next     = 1
+        self.__end      = 1  # First id past the current block
+        self.__lock     = Lock()
+
+    @property
+    def shared(self):
+        """True if ids are reserved from the DB, so they're safe to insert."""
+        return self.reserve is not None
+
+    def __call__(self):
+        with self.__lock:
+            if self.__next >= self.__end:
+                if self.reserve is None:
+                    self.__end += self.block_size
+                else:
+                    self.__next = self.reserve(self.block_size)
+                    self.__end  = self.__next + self.block_size
+            id = self.__next
+            self.__next += 1
+            return id
@@ -0,0 +1,91 @@
+import atexit
+import logging
+from datetime import datetime
+
+from .chunks import ChunkedRooms
+from .models import background_session
+from .room import reset_inventories
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryResetter:
+    """
+    Resets room inventories in the background, so moving
+    between rooms never waits on the DB.
+
+    Every `interval` seconds, a single background task finds every
+    room due for a new inventory (see `Room.needs_reset`) in this
+    worker's part of each world, and resets them with
+    `reset_inventories()`, `batch_size` rooms per transaction.
+    Players in those rooms get a "roomupdate".
+
+    worlds → iterable of the Worlds to reset (a `WorldRegistry`)
+    """
+
+    def __init__(self, app, worlds, interval=30, batch_size=500):
+        self.app        = app
+        self.worlds     = worlds
+        self.interval   = interval
+        self.batch_size = batch_size
+        self.running    = False
+
+    def start(self, socketio):
+        """Starts the background task with socketio's async mode."""
+        if self.running:
+            return
+        self.running = True
+        socketio.start_background_task(self.__run, socketio)
+        atexit.register(self.stop)
+
+    def stop(self):
+        self.running = False
+
+    def due_rooms(self, world, now):
+        """Returns this worker's rooms in the world that need a new inventory."""
+        if isinstance(world.rooms, ChunkedRooms):
+            # Unloaded chunks are rebuilt with fresh items anyway
+            rooms = world.rooms.loaded_rooms()
+        else:
+            rooms = world.rooms.values()
+        return [room for room in rooms
+                if world.partition.owns(room.world_loc) and room.needs_reset(now)]
+
+    def run_once(self, socketio=None):
+        """
+        Resets every room that's due. Sends the new rooms
+        out with socketio, if given.
+
+        Returns the number of rooms reset.
+        """
+        now = datetime.now()
+        reset = 0
+        with background_session(self.app) as session:
+            for world in list(self.worlds):
+                rooms = self.due_rooms(world, now)
+                if not rooms:
+                    continue
+                if world.item_writer is not None:
+                    # Items just taken from these rooms must be saved as the player's first
+                    world.item_writer.flush()
+                for start in range(0, len(rooms), self.batch_size):
+                    batch = rooms[start:start + self.batch_size]
+                    reset_inventories(batch, now, session)
+                    reset += len(batch)
+                    if socketio is None:
+                        continue
+                    for room in batch:
+                        # A new inventory is too big a change for a delta
+                        for deltas in [False, True]:
+                            socketio.emit("roomupdate", {'room': room.serialize(), 'chat': None},
+                                          room=world.socket_room(room.world_loc, deltas))
+        return reset
+
+    def __run(self, socketio):
+        while self.running:
+            socketio.sleep(self.interval)
+            try:
+                self.run_once(socketio)
+            except Exception:
+                # Keep resetting. The rooms are still due next time
+                logger.exception("Resetting room inventories failed")
@@ -11,23 +11,30 @@ from random import randint
 
 
 class Item:
-    """Base class for all Items. Use Child classes when possible"""
-
-    def __init__(self, name, description, id=0, weight=None, score=None):
-        self.name        = name
-        self.description = description
-        self.id          = id
-
-        if weight == None and score == None:
-            self.weight = 1
-            self.score  = 1
-        elif weight == None:
-            self.weight = 1
-        elif score == None:
-            self.score  = 1
-        else:
-            self.weight = weight
-            self.score  = score
+    """
+    Base class for all Items. Use Child classes when possible
+
+    Items only store their id, weight and score. Name and description
+    are class attributes shared by every item of a type.
+    """
+
+    __slots__ = ('id', 'weight', 'score')
+
+    name        = "Item"
+    description = "An item."
+
+    def __init__(self, id=0, weight=None, score=None):
+        self.id     = id
+        self.weight = self.random_weight() if weight is None else weight
+        self.score  = self.random_score() if score is None else score
+
+    @staticmethod
+    def random_weight():
+        return 1
+
+    @staticmethod
+    def random_score():
+        return 1
 
     def serialize(self):
         return {
@@ -53,76 +60,111 @@ class Item:
 class Trash(Item):
     """Item with low score, low-ish weight. Try not to get too much."""
 
-    def __init__(self, id, weight=None, score=None):
-        if weight == None and score == None:
-            self.weight = randint(1, 3)
-            self.score  = randint(1, 10) * 100
-        elif weight == None:
-            self.weight = randint(1, 3)
-        elif score == None:
-            self.score  = randint(1, 10) * 100
-        else:
-            self.weight = weight
-            self.score  = score
+    __slots__ = ()
 
-        super().__init__("Trash", "Low score, low weight. Try not to get too much.",
-                         id, self.weight, self.score)
+    name        = "Trash"
+    description = "Low score, low weight. Try not to get too much."
+
+    @staticmethod
+    def random_weight():
+        return randint(1, 3)
+
+    @staticmethod
+    def random_score():
+        return randint(1, 10) * 100
 
 
 class Stick(Item):
     """Item with medium score, medium weight. not bad for an ant."""
 
-    def __init__(self, id, weight=None, score=None):
-        if weight == None and score == None:
-            self.weight = randint(3, 7)
-            self.score  = randint(10, 25) * 100
-        elif weight == None:
-            self.weight = randint(3, 7)
-        elif score == None:
-            self.score  = randint(10, 25) * 100
-        else:
-            self.weight = weight
-            self.score  = score
+    __slots__ = ()
+
+    name        = "Stick"
+    description = "Medium score, medium weight. not bad for an ant."
 
-        super().__init__("Stick", "Medium score, medium weight. not bad for an ant.",
-                         id, self.weight, self.score)
+    @staticmethod
+    def random_weight():
+        return randint(3, 7)
+
+    @staticmethod
+    def random_score():
+        return randint(10, 25) * 100
 
 
 class Gem(Item):
     """Item with high score, high weight."""
 
-    def __init__(self, id, weight=None, score=None):
-        if weight == None and score == None:
-            self.weight = randint(5, 10)
-            self.score  = randint(50, 100) * 100
-        elif weight == None:
-            self.weight = randint(5, 10)
-        elif score == None:
-            self.score  = randint(50, 100) * 100
-        else:
-            self.weight = weight
-            self.score  = score
+    __slots__ = ()
+
+    name        = "Gem"
+    description = "High score, high weight."
+
+    @staticmethod
+    def random_weight():
+        return randint(5, 10)
 
-        super().__init__("Gem", "High score, high weight.", id, self.weight, self.score)
+    @staticmethod
+    def random_score():
+        return randint(50, 100) * 100
 
 
 class Hammer(Item):
     """A tool. Useful? Maybe not, but it has value.."""
 
-    def __init__(self, id, weight=None, score=None):
-        if weight == None and score == None:
-            self.weight = randint(5, 10)
-            self.score  = randint(25, 50) * 100
-        elif weight == None:
-            self.weight = randint(5, 10)
-        elif score == None:
-            self.score  = randint(25, 50) * 100
-        else:
-            self.weight = weight
-            self.score  = score
+    __slots__ = ()
 
-        super().__init__("Hammer", "A tool. Useful? Maybe not, but it has value.",
-                         id, self.weight, self.score)
+    name        = "Hammer"
+    description = "A tool. Useful? Maybe not, but it has value."
+
+    @staticmethod
+    def random_weight():
+        return randint(5, 10)
+
+    @staticmethod
+    def random_score():
+        return randint(25, 50) * 100
+
+
+def random_candidates(counts):
+    """
+    Rolls potential items without building them, so callers
+    only build the few they end up choosing.
+
+    counts → list of (item class, how many) pairs
+
+    Returns [(item class, id, weight, score)]. Random numbers are
+    drawn in the same order as building the items would.
+    """
+    candidates = []
+    for item_class, count in counts:
+        for _ in range(count):
+            id = randint(0, 10**8)
+            weight = item_class.random_weight()
+            candidates.append((item_class, id, weight, item_class.random_score()))
+    return candidates
+
+
+def build_items(candidates, next_id=None):
+    """
+    Builds { key: Item.id, value: Item } from `random_candidates()` picks.
+
+    next_id → called for each item's id (an `IdAllocator`).
+              Without it, the random candidate ids are used.
+
+    Picks sharing a candidate id make one item, the last of them,
+    either way.
+    """
+    # picks { key: candidate id, value: (item class, weight, score) }
+    picks = {id: (item_class, weight, score)
+             for item_class, id, weight, score in candidates}
+    if next_id is None:
+        return {id: item_class(id, weight, score)
+                for id, (item_class, weight, score) in picks.items()}
+    items = {}
+    for item_class, weight, score in picks.values():
+        item = item_class(next_id(), weight, score)
+        items[item.id] = item
+    return items
 
 
 def db_to_class(model_info):
@@ -136,3 +178,15 @@ def db_to_class(model_info):
     if model_info.name == "Hammer":
         return Hammer(model_info.id, model_info.weight, model_info.score)
     raise TypeError("Name must be a subclass of an item")
+
+
+def item_row(item, player_id=None, room_id=None):
+    """Function that takes in an Item and returns its `items` table row as a dict"""
+    return {
+        'id': item.id,
+        'name': item.name,
+        'weight': item.weight,
+        'score': item.score,
+        'player_id': player_id,
+        'room_id': room_id
+    }
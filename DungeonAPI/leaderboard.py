@@ -0,0 +1,135 @@
+import heapq
+import logging
+from threading import Lock
+from time import time
+
+from flask_socketio import emit
+
+from .models import Users
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """
+    Top `size` highscores of all users, online or not.
+
+    Kept in a min-heap of (highscore, user id), so checking or
+    inserting a score is O(log size). Replaced entries are left in
+    the heap and skipped when they reach the top.
+
+    Changes are broadcast as "highscoreupdate" at most once
+    every `broadcast_interval` seconds by a background task (see
+    `start()`). Without it, each change is broadcast immediately.
+
+    refresh_interval → reload from the DB this often, in seconds.
+                       For several workers sharing the users table.
+    room             → the socket room to broadcast to. Everyone if None.
+    """
+
+    def __init__(self, size=3, broadcast_interval=0.5, refresh_interval=None, room=None):
+        self.size               = size
+        self.broadcast_interval = broadcast_interval
+        self.refresh_interval   = refresh_interval
+        self.room               = room
+        self.criteria           = ()
+        # members { key: user id, value: (highscore, username) }
+        self.members            = {}
+        self.heap               = []
+        self.changed            = False
+        self.running            = False
+        self.__lock             = Lock()
+
+    def load_from_db(self, *criteria):
+        """
+        Seeds the leaderboard with the top highscores of
+        users matching the criteria (all users by default).
+
+        The criteria are kept for later refreshes.
+        """
+        self.criteria = criteria or self.criteria
+        top_users = Users.query.with_entities(Users.id, Users.username, Users.highscore) \
+                               .filter(*self.criteria) \
+                               .order_by(Users.highscore.desc()).limit(self.size)
+        with self.__lock:
+            self.members = {u.id: (u.highscore, u.username) for u in top_users}
+            self.heap    = [(score, id) for id, (score, _) in self.members.items()]
+            heapq.heapify(self.heap)
+
+    def update(self, user_id, username, highscore):
+        """
+        Records a user's highscore.
+
+        Returns True if the leaderboard changed.
+        """
+        with self.__lock:
+            if user_id in self.members:
+                if highscore <= self.members[user_id][0]:
+                    return False
+            elif len(self.members) >= self.size:
+                if highscore <= self.__lowest():
+                    return False
+                _, lowest_id = heapq.heappop(self.heap)
+                del self.members[lowest_id]
+
+            self.members[user_id] = (highscore, username)
+            heapq.heappush(self.heap, (highscore, user_id))
+            if len(self.heap) > 4 * self.size:
+                # Too many replaced entries. Rebuild from members
+                self.heap = [(score, id) for id, (score, _) in self.members.items()]
+                heapq.heapify(self.heap)
+            self.changed = True
+
+        if not self.running:
+            self.broadcast()
+        return True
+
+    def __lowest(self):
+        """Returns the lowest current highscore, dropping replaced heap entries."""
+        while self.heap:
+            score, user_id = self.heap[0]
+            member = self.members.get(user_id)
+            if member is not None and member[0] == score:
+                return score
+            heapq.heappop(self.heap)
+        return None
+
+    def serialize(self):
+        """Returns ["username highscore", ...], highest first."""
+        with self.__lock:
+            ranked = sorted(self.members.values(), reverse=True)
+        return [f"{username} {highscore}" for highscore, username in ranked]
+
+    def broadcast(self):
+        """Sends the leaderboard to every socket in `room`, from within a socket handler."""
+        self.changed = False
+        emit("highscoreupdate", self.serialize(), broadcast=True, room=self.room)
+
+    def start(self, socketio, app=None):
+        """
+        Starts a background task sending changes every `broadcast_interval` seconds.
+
+        app → needed to reload from the DB with `refresh_interval`.
+        """
+        if self.running:
+            return
+        self.running = True
+        socketio.start_background_task(self.__run, socketio, app)
+
+    def stop(self):
+        self.running = False
+
+    def __run(self, socketio, app):
+        last_refresh = time()
+        while self.running:
+            socketio.sleep(self.broadcast_interval)
+            if self.changed:
+                self.changed = False
+                socketio.emit("highscoreupdate", self.serialize(), room=self.room)
+            if self.refresh_interval and app and time() - last_refresh >= self.refresh_interval:
+                last_refresh = time()
+                try:
+                    with app.app_context():
+                        self.load_from_db()
+                except Exception:
+                    logger.exception("Reloading the leaderboard failed")
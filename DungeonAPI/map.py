@@ -1,18 +1,43 @@
 import random
 import time
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional. It is only needed for Map(..., use_numpy=True)
+    np = None
+
 from .room import Room, Tunnel, DeadEnd, Store
-from .item import Trash, Stick, Gem, Hammer
+from .item import Trash, Stick, Gem, Hammer, random_candidates, build_items
 from .constants.adjectives import adjectives
 from .constants.places import places
 
 
+# Room type codes used by Map.classify_rooms()
+ROOM, STORE, DEAD_END, TUNNEL = 0, 1, 2, 3
+ROOM_TYPES = {ROOM: 'room', STORE: 'store', DEAD_END: 'dead-end', TUNNEL: 'tunnel'}
+
+
 class Map:
-    def __init__(self, size, room_limit):
-        self.grid = []
-        row = [0] * size
-        for i in range(size):
-            row = row.copy()
-            self.grid.append(row)
+    def __init__(self, size, room_limit, use_numpy=False):
+        """
+        use_numpy → store the grid in a uint8 NumPy array and type
+                    every room in one vectorized pass. The same seed
+                    gives the same map either way. Requires NumPy.
+        """
+        if use_numpy and np is None:
+            raise ImportError("NumPy is required for Map(..., use_numpy=True)")
+        self.use_numpy = use_numpy
+        if use_numpy:
+            # The walkers write to a flat bytearray (much faster than
+            # indexing NumPy one cell at a time), `grid` is a view of it
+            self.cells = bytearray(size * size)
+            self.grid  = np.frombuffer(self.cells, dtype=np.uint8).reshape(size, size)
+        else:
+            self.grid = []
+            row = [0] * size
+            for i in range(size):
+                row = row.copy()
+                self.grid.append(row)
         self.locations = [''] * (len(adjectives) * len(places))
         i = 0
         for adjective in adjectives:
@@ -34,18 +59,24 @@ class Map:
         del self.locations[idx]
         return loc_name
 
-    def create_room(self, x, y, room_type, world=None):
+    def create_room(self, x, y, room_type, world=None, loc_name=None):
+        """
+        Builds a room of the given type with a random inventory.
+
+        loc_name → name for a 'room' type room. Picked
+                   with `get_loc_name()` if not given.
+        """
         id          = int(f"{str(x)}{str(y)}")
         world_loc   = (x,y)
         name        = f"Room #{id}"
         description = f"The description for {name}."
 
-        potential_items = [Trash(random.randint(0, 10**8)) for _ in range(10)]
-        potential_items += [Stick(random.randint(0, 10**8)) for _ in range(10)]
-        potential_items += [Hammer(random.randint(0, 10**8)) for _ in range(5)]
-        potential_items += [Gem(random.randint(0, 10**8)) for _ in range(1)]
+        # Only the 10 chosen items are built
+        potential_items = random_candidates(
+            [(Trash, 10), (Stick, 10), (Hammer, 5), (Gem, 1)])
 
-        items = { i.id:i for i in random.choices(potential_items, k=10) }
+        # Rolled for every room type, so the map's random sequence stays the same
+        chosen_items = random.choices(potential_items, k=10)
 
         if room_type == "dead-end":
             loc_name = {"place": "dead end", "adjective": None}
@@ -57,15 +88,21 @@ class Map:
             loc_name = {"place": "ant store", "adjective": None}
             return Store(world, world_loc, loc_name, id)
         else:
-            loc_name    = self.get_loc_name()
+            loc_name    = loc_name or self.get_loc_name()
             title_adj   = loc_name["adjective"].title()
             title_place = loc_name["place"].title()
             name        = f"The {title_adj} {title_place}"
             description = f"Wow, this place is so {loc_name['adjective']}!"
+            items = build_items(chosen_items, world.item_ids if world is not None else None)
             return Room(world, name, description, world_loc, loc_name, id, items)
 
     def set_grid(self, y, x):
-        if self.grid[y][x] != 1:
+        if self.use_numpy:
+            cell = y * self.size + x
+            if self.cells[cell] != 1:
+                self.cells[cell] = 1
+                self.room_count += 1
+        elif self.grid[y][x] != 1:
             self.grid[y][x] = 1
             self.room_count += 1
 
@@ -129,33 +166,63 @@ class Map:
             return 'a'
 
     def get_descriptions(self):
-        for coords, room in self.rooms.items():
-            if isinstance(room, Tunnel) or isinstance(room, DeadEnd):
-                continue
-            neighbors = {
-                "north": self.rooms.get((coords[0], coords[1]-1)),
-                "south": self.rooms.get((coords[0], coords[1]+1)),
-                "east":  self.rooms.get((coords[0]+1, coords[1])),
-                "west":  self.rooms.get((coords[0]-1, coords[1]))
-            }
-            desc_strings = []
-            for direction, neighbor in neighbors.items():
-                if neighbor:
-                    article = self.get_indef_article(neighbor.loc_name["place"])
-                    desc_strings.append(f"to the {direction} is {article} {neighbor.loc_name['place']}")
-            for i, string in enumerate(desc_strings):
-                length = len(desc_strings)
-                if i == 0:
-                    desc_strings[i] = ' ' + string[:1].upper() + string[1:]
-                if i < length-1 and length > 2:
-                    desc_strings[i] += ','
-                elif i == length-1:
-                    desc_strings[i] += '.'
-            desc_strings.insert(-1, 'and')
-            room.description += ' '.join(desc_strings)
+        for room in self.rooms.values():
+            self.describe_room(room, self.get_place)
+
+    def get_place(self, coords):
+        """Returns the place name of the room at coords, or None if there isn't one."""
+        room = self.rooms.get(coords)
+        return room.loc_name["place"] if room else None
+
+    def describe_room(self, room, get_place):
+        """
+        Adds the neighboring places to the room's description.
+
+        get_place → function taking coordinates, returning
+                    the place name there or None.
+        """
+        if isinstance(room, Tunnel) or isinstance(room, DeadEnd):
+            return
+        coords = room.world_loc
+        neighbors = {
+            "north": get_place((coords[0], coords[1]-1)),
+            "south": get_place((coords[0], coords[1]+1)),
+            "east":  get_place((coords[0]+1, coords[1])),
+            "west":  get_place((coords[0]-1, coords[1]))
+        }
+        desc_strings = []
+        for direction, place in neighbors.items():
+            if place:
+                article = self.get_indef_article(place)
+                desc_strings.append(f"to the {direction} is {article} {place}")
+        for i, string in enumerate(desc_strings):
+            length = len(desc_strings)
+            if i == 0:
+                desc_strings[i] = ' ' + string[:1].upper() + string[1:]
+            if i < length-1 and length > 2:
+                desc_strings[i] += ','
+            elif i == length-1:
+                desc_strings[i] += '.'
+        desc_strings.insert(-1, 'and')
+        room.description += ' '.join(desc_strings)
 
     def generate_rooms(self, world=None):
-        room_count = 0 
+        for i, j, room_type in self.room_layout():
+            self.rooms[(j,i)] = self.create_room(j, i, room_type, world)
+        self.get_descriptions()
+        return self.rooms
+
+    def room_layout(self):
+        """
+        Yields (row, col, room_type) for every room on the grid,
+        in row-major order. Uses `classify_rooms()` with NumPy.
+        """
+        if self.use_numpy:
+            rows, cols, room_types = self.classify_rooms()
+            for i, j, room_type in zip(rows.tolist(), cols.tolist(), room_types.tolist()):
+                yield i, j, ROOM_TYPES[room_type]
+            return
+        room_count = 0
         for i in range(self.size):
             for j in range(self.size):
                 if self.grid[i][j] == 1:
@@ -172,10 +239,42 @@ class Map:
                             room_type = 'room'
                         else:
                             room_type = 'tunnel'
-                    self.rooms[(j,i)] = self.create_room(j, i, room_type, world)
+                    yield i, j, room_type
                     room_count += 1
-        self.get_descriptions()
-        return self.rooms
+
+    def classify_rooms(self):
+        """
+        NumPy only. Types every room on the grid with array shifts,
+        following the same rules as `generate_rooms`.
+
+        Returns (rows, cols, room_types) arrays, in row-major order.
+        room_types holds ROOM/STORE/DEAD_END/TUNNEL codes.
+        """
+        grid = self.grid.astype(bool)
+
+        def shifted(di, dj):
+            """out[i, j] = grid[i + di, j + dj], False past the edges"""
+            out = np.zeros_like(grid)
+            size = self.size
+            out[max(-di, 0):size - max(di, 0), max(-dj, 0):size - max(dj, 0)] = \
+                grid[max(di, 0):size - max(-di, 0), max(dj, 0):size - max(-dj, 0)]
+            return out
+
+        n, s = shifted(-1, 0), shifted(1, 0)
+        e, w = shifted(0, 1), shifted(0, -1)
+        neighbor_count = (n.astype(np.uint8) + s + e + w)[grid]
+
+        # A corner with its inside diagonal filled is part of a room
+        inside_corner = ((n & e & shifted(-1, 1)) | (n & w & shifted(-1, -1)) |
+                         (s & e & shifted(1, 1))  | (s & w & shifted(1, -1)))[grid]
+        inside_corner &= neighbor_count == 2
+
+        rows, cols = np.nonzero(grid)
+        room_types = np.full(len(rows), TUNNEL, dtype=np.uint8)
+        room_types[(neighbor_count > 2) | inside_corner] = ROOM
+        room_types[neighbor_count == 1] = DEAD_END
+        room_types[np.arange(len(rows)) % 50 == 0] = STORE
+        return rows, cols, room_types
 
     def print_grid(self):
         for i, row in enumerate(self.grid):
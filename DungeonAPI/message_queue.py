@@ -0,0 +1,37 @@
+from collections import defaultdict
+
+from socketio import Manager
+
+
+class LocalMessageQueue(Manager):
+    """
+    A socket message queue shared by every server in this process.
+
+    Stands in for Redis or RabbitMQ (`SocketIO(message_queue=url)`)
+    in tests and local runs: broadcasts from any app made by
+    `create_app()` reach the clients of all apps on the same channel,
+    like workers behind a real queue.
+
+    Messages are delivered right away, in the caller, so it
+    works with the Flask-SocketIO test client.
+
+    Set SOCKETIO_MESSAGE_QUEUE=local to use it.
+    """
+    name = 'local'
+
+    # servers { key: channel name, value: [LocalMessageQueue of each server] }
+    servers = defaultdict(list)
+
+    def __init__(self, channel='socketio'):
+        super().__init__()
+        self.channel = channel
+        self.servers[channel].append(self)
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None,
+             callback=None, **kwargs):
+        for manager in self.servers[self.channel]:
+            if manager.server is None:
+                continue
+            # Callbacks can only come back from this server's own clients
+            Manager.emit(manager, event, data, namespace, room=room or kwargs.get('to'),
+                         skip_sid=skip_sid, callback=callback if manager is self else None)
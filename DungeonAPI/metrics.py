@@ -0,0 +1,240 @@
+from functools import wraps
+from threading import Lock, local
+from time import perf_counter
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+class Metrics:
+    """
+    Per-event instrumentation for socket handlers.
+
+    For every socket event, records:
+        - how many were handled, and how many were rejected
+        - a latency histogram
+        - time spent in DB queries
+        - how many sockets each emit reached
+
+    And for every watched connection pool, how long
+    checkouts waited and how many timed out.
+
+    `render()` returns everything in Prometheus' text format.
+
+    Subclass and override the `record_*` methods to send
+    the numbers somewhere else.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets    = buckets
+        # Each { key: event name, value: number or list }
+        self.counts     = {}
+        self.histograms = {}  # bucket counts, in `buckets` order
+        self.seconds    = {}
+        self.db_seconds = {}
+        self.rejected   = {}
+        self.emits      = {}
+        self.recipients = {}
+        # Each { key: pool name, value: number, list or Pool }
+        self.pools         = {}
+        self.pool_waits    = {}
+        self.pool_seconds  = {}
+        self.pool_buckets  = {}  # bucket counts, in `buckets` order
+        self.pool_timeouts = {}
+        self.__lock     = Lock()
+        self.__current  = local()  # The event being handled by this thread
+
+    def instrument(self, event_name):
+        """Decorator timing a socket handler as `event_name`."""
+        def decorator(f):
+            @wraps(f)
+            def handler(*args, **kwargs):
+                current = self.__current
+                current.event      = event_name
+                current.db_seconds = 0
+                start = perf_counter()
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.record_event(event_name, perf_counter() - start,
+                                      current.db_seconds)
+                    current.event = None
+            return handler
+        return decorator
+
+    @property
+    def current_event(self):
+        return getattr(self.__current, 'event', None)
+
+    def watch_engine(self, engine):
+        """Adds the time spent in the engine's queries to the current event."""
+        def before_cursor_execute(conn, *_, **__):
+            conn.info.setdefault('query_start', []).append(perf_counter())
+
+        def after_cursor_execute(conn, *_, **__):
+            seconds = perf_counter() - conn.info['query_start'].pop()
+            if self.current_event is not None:
+                self.__current.db_seconds += seconds
+
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    def watch_pool(self, engine, name):
+        """
+        Times every checkout from the engine's connection pool as
+        `name`, including opening a new connection when the pool
+        makes one.
+
+        SQLAlchemy has no event before a checkout starts waiting
+        (`checkout`/`connect` fire once it's over), so this wraps the
+        pool's public `connect()`, which the engine calls for every
+        checkout with any pool class.
+        """
+        pool    = engine.pool
+        connect = getattr(pool, 'connect', None)
+        if not callable(connect):
+            raise TypeError(f"Can't time checkouts from {type(pool).__name__}: it has no connect()")
+
+        def timed_connect():
+            start = perf_counter()
+            try:
+                connection = connect()
+            except PoolTimeout:
+                self.record_pool_wait(name, perf_counter() - start, timed_out=True)
+                raise
+            self.record_pool_wait(name, perf_counter() - start)
+            return connection
+
+        pool.connect = timed_connect
+        with self.__lock:
+            self.pools[name] = pool
+
+    def record_pool_wait(self, pool_name, seconds, timed_out=False):
+        with self.__lock:
+            if pool_name not in self.pool_waits:
+                self.pool_waits[pool_name]    = 0
+                self.pool_seconds[pool_name]  = 0
+                self.pool_buckets[pool_name]  = [0] * len(self.buckets)
+                self.pool_timeouts[pool_name] = 0
+            self.pool_waits[pool_name]   += 1
+            self.pool_seconds[pool_name] += seconds
+            if timed_out:
+                self.pool_timeouts[pool_name] += 1
+            histogram = self.pool_buckets[pool_name]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+
+    def record_event(self, event_name, seconds, db_seconds):
+        with self.__lock:
+            if event_name not in self.counts:
+                self.counts[event_name]     = 0
+                self.histograms[event_name] = [0] * len(self.buckets)
+                self.seconds[event_name]    = 0
+                self.db_seconds[event_name] = 0
+            self.counts[event_name]     += 1
+            self.seconds[event_name]    += seconds
+            self.db_seconds[event_name] += db_seconds
+            histogram = self.histograms[event_name]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+                    break
+
+    def record_rejected(self, reason):
+        """Counts the current event as rejected, e.g. no player found."""
+        key = (self.current_event, reason)
+        with self.__lock:
+            self.rejected[key] = self.rejected.get(key, 0) + 1
+
+    def record_emit(self, recipients):
+        """Counts an emit from the current event and the sockets it reached."""
+        event_name = self.current_event
+        with self.__lock:
+            self.emits[event_name]      = self.emits.get(event_name, 0) + 1
+            self.recipients[event_name] = self.recipients.get(event_name, 0) + recipients
+
+    def render(self):
+        """Returns all metrics in Prometheus' text exposition format."""
+        with self.__lock:
+            lines = [
+                "# HELP dungeon_socket_events_total Socket events handled.",
+                "# TYPE dungeon_socket_events_total counter"
+            ]
+            for name, count in self.counts.items():
+                lines.append(f'dungeon_socket_events_total{{event="{name}"}} {count}')
+
+            lines += [
+                "# HELP dungeon_socket_event_seconds Time to handle a socket event.",
+                "# TYPE dungeon_socket_event_seconds histogram"
+            ]
+            for name, histogram in self.histograms.items():
+                total = 0
+                for bound, count in zip(self.buckets, histogram):
+                    total += count
+                    lines.append(f'dungeon_socket_event_seconds_bucket{{event="{name}",le="{bound}"}} {total}')
+                lines.append(f'dungeon_socket_event_seconds_bucket{{event="{name}",le="+Inf"}} {self.counts[name]}')
+                lines.append(f'dungeon_socket_event_seconds_sum{{event="{name}"}} {self.seconds[name]}')
+                lines.append(f'dungeon_socket_event_seconds_count{{event="{name}"}} {self.counts[name]}')
+
+            lines += [
+                "# HELP dungeon_socket_db_seconds_total Time spent in DB queries while handling socket events.",
+                "# TYPE dungeon_socket_db_seconds_total counter"
+            ]
+            for name, seconds in self.db_seconds.items():
+                lines.append(f'dungeon_socket_db_seconds_total{{event="{name}"}} {seconds}')
+
+            lines += [
+                "# HELP dungeon_socket_rejected_total Socket events rejected before their handler ran.",
+                "# TYPE dungeon_socket_rejected_total counter"
+            ]
+            for (name, reason), count in self.rejected.items():
+                lines.append(f'dungeon_socket_rejected_total{{event="{name}",reason="{reason}"}} {count}')
+
+            lines += [
+                "# HELP dungeon_socket_emits_total Room emits sent while handling socket events.",
+                "# TYPE dungeon_socket_emits_total counter"
+            ]
+            for name, count in self.emits.items():
+                lines.append(f'dungeon_socket_emits_total{{event="{name}"}} {count}')
+
+            lines += [
+                "# HELP dungeon_socket_emit_recipients_total Sockets reached by room emits.",
+                "# TYPE dungeon_socket_emit_recipients_total counter"
+            ]
+            for name, count in self.recipients.items():
+                lines.append(f'dungeon_socket_emit_recipients_total{{event="{name}"}} {count}')
+
+            lines += [
+                "# HELP dungeon_db_pool_wait_seconds Time to check a connection out of a pool.",
+                "# TYPE dungeon_db_pool_wait_seconds histogram"
+            ]
+            for name, histogram in self.pool_buckets.items():
+                total = 0
+                for bound, count in zip(self.buckets, histogram):
+                    total += count
+                    lines.append(f'dungeon_db_pool_wait_seconds_bucket{{pool="{name}",le="{bound}"}} {total}')
+                lines.append(f'dungeon_db_pool_wait_seconds_bucket{{pool="{name}",le="+Inf"}} {self.pool_waits[name]}')
+                lines.append(f'dungeon_db_pool_wait_seconds_sum{{pool="{name}"}} {self.pool_seconds[name]}')
+                lines.append(f'dungeon_db_pool_wait_seconds_count{{pool="{name}"}} {self.pool_waits[name]}')
+
+            lines += [
+                "# HELP dungeon_db_pool_timeouts_total Checkouts that gave up waiting for a connection.",
+                "# TYPE dungeon_db_pool_timeouts_total counter"
+            ]
+            for name, count in self.pool_timeouts.items():
+                lines.append(f'dungeon_db_pool_timeouts_total{{pool="{name}"}} {count}')
+
+            lines += [
+                "# HELP dungeon_db_pool_checked_out Connections currently checked out of a pool.",
+                "# TYPE dungeon_db_pool_checked_out gauge"
+            ]
+            for name, pool in self.pools.items():
+                if hasattr(pool, 'checkedout'):
+                    lines.append(f'dungeon_db_pool_checked_out{{pool="{name}"}} {pool.checkedout()}')
+
+        return "\n".join(lines) + "\n"
@@ -1,24 +1,271 @@
+import logging
+from contextlib import contextmanager
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 DB = SQLAlchemy()
 
+logger = logging.getLogger(__name__)
+
+# Rows sent per executemany() call by bulk_insert
+BULK_INSERT_BATCH = 1000
 
-def update_items_db(app, item_ids, player_id, room_id):
+
+def pool_options(database_url, size, overflow, timeout, recycle, pre_ping):
     """
-    Finds the items with the given id,
-    and updates their foreign keys in the DB.
+    Returns `create_engine()` pool options for the database.
 
-    item_ids MUST be passed in as a list.
+    SQLite doesn't take pool sizes (older SQLAlchemy gives file
+    databases a NullPool), so only recycle/pre-ping apply there.
     """
+    options = {'pool_recycle': recycle, 'pool_pre_ping': pre_ping}
+    if not database_url.startswith('sqlite'):
+        options.update(pool_size=size, max_overflow=overflow, pool_timeout=timeout)
+    return options
+
+
+@contextmanager
+def background_session(app):
+    """
+    Yields a session for background persistence (ItemWriter,
+    InventoryResetter, PlayerCheckpointer) inside an app context.
+
+    The session uses the app's background engine
+    (`app.extensions['dungeon_background_engine']`), so background
+    writes never wait for, or hold, the request path's connections.
+    Apps without one get DB.session.
+
+    Callers commit. A background session is closed at the end,
+    which rolls back anything uncommitted.
+    """
+    engine = app.extensions.get('dungeon_background_engine')
     with app.app_context():
-        db_items = Items.query.filter(Items.id.in_(item_ids)).all()
-        for i in db_items:
-            i.room_id = room_id
-            i.player_id = player_id
-        DB.session.commit()
+        if engine is None:
+            yield DB.session
+            return
+        session = Session(bind=engine)
+        try:
+            yield session
+        finally:
+            session.close()
+
+
+def bulk_insert(model, rows, batch_size=BULK_INSERT_BATCH, session=None):
+    """
+    Inserts a list of row dictionaries into the model's table
+    using batched executemany() calls on the session (DB.session
+    by default).
+
+    Does NOT commit. Rows are expected to carry their own ids.
+    """
+    session = session or DB.session
+    table   = model.__table__
+    for start in range(0, len(rows), batch_size):
+        session.execute(table.insert(), rows[start:start + batch_size])
+
+
+def upsert(model, rows, batch_size=BULK_INSERT_BATCH, session=None):
+    """
+    Inserts a list of row dictionaries into the model's table,
+    updating the existing row instead wherever the id is taken.
+
+    Uses INSERT ... ON CONFLICT DO UPDATE on Postgres and SQLite,
+    and an UPDATE for known ids + INSERT for the rest elsewhere.
+    Every row must have the same keys, including 'id'.
+
+    Does NOT commit.
+    """
+    if not rows:
+        return
+    session = session or DB.session
+    table   = model.__table__
+    columns = [c for c in rows[0] if c != 'id']
+    insert  = _dialect_insert()
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if insert is not None:
+            stmt = insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['id'],
+                set_={c: stmt.excluded[c] for c in columns})
+            session.execute(stmt, batch)
+            continue
+
+        ids = [row['id'] for row in batch]
+        existing = {id for id, in session.query(model.id).filter(model.id.in_(ids))}
+        # bindparam names can't match the column names being updated
+        updates = [{f"_{k}": v for k, v in row.items()}
+                   for row in batch if row['id'] in existing]
+        inserts = [row for row in batch if row['id'] not in existing]
+        if updates:
+            stmt = table.update().where(table.c.id == DB.bindparam('_id')).values(
+                {c: DB.bindparam(f"_{c}") for c in columns})
+            session.execute(stmt, updates)
+        if inserts:
+            session.execute(table.insert(), inserts)
+
+
+def _dialect_insert():
+    """Returns the dialect's insert() if it supports ON CONFLICT, else None"""
+    dialect = DB.engine.dialect.name
+    try:
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+            return insert
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+            return insert
+    except ImportError:
+        # Older SQLAlchemy without ON CONFLICT support for this dialect
+        pass
+    return None
+
+
+def sync_id_sequence(model, session=None):
+    """
+    Moves the model's Postgres id sequence past the highest stored id.
+
+    Needed after inserting rows with client-assigned ids, so later
+    inserts that let the database pick an id don't collide.
+    Does nothing on other databases.
+    """
+    if DB.engine.dialect.name != 'postgresql':
+        return
+    table = model.__table__.name
+    (session or DB.session).execute(DB.text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"COALESCE(MAX(id), 0) + 1, false) FROM {table}"))
+
+
+def reserve_ids(model, count, engine=None):
+    """
+    Reserves `count` ids for the model's table in `id_blocks`,
+    shared by every process using the database.
+
+    Returns the first id. The block is [first, first + count).
+
+    Commits on its own connection from `engine` (DB.engine by
+    default), so a block is never handed out twice, even if the
+    caller's transaction rolls back.
+    """
+    blocks = IdBlocks.__table__
+    name   = model.__tablename__
+    engine = engine or DB.engine
+    for _ in range(2):
+        try:
+            with engine.begin() as connection:
+                updated = connection.execute(
+                    blocks.update().where(blocks.c.name == name)
+                                   .values(next_id=blocks.c.next_id + count))
+                if updated.rowcount == 0:
+                    # First block. Start past the ids already in the table
+                    first = connection.execute(
+                        DB.text(f"SELECT MAX(id) FROM {name}")).scalar() or 0
+                    connection.execute(blocks.insert(),
+                                       {'name': name, 'next_id': first + 1 + count})
+                    return first + 1
+                next_id = connection.execute(
+                    DB.text("SELECT next_id FROM id_blocks WHERE name = :name"),
+                    {'name': name}).scalar()
+                return next_id - count
+        except IntegrityError:
+            # Another process added the first block. Take the next one
+            continue
+    raise RuntimeError(f"Could not reserve ids for {name}")
+
+
+def add_missing_columns(model):
+    """
+    Adds the model's columns that its table doesn't have yet,
+    for tables created before those columns existed.
+
+    Columns are added without constraints, so they must be nullable.
+    Their indexes are left to `add_missing_indexes()`. Commits.
+    """
+    table    = model.__table__
+    existing = {c['name'] for c in inspect(DB.engine).get_columns(table.name)}
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(DB.engine.dialect)
+        DB.session.execute(DB.text(
+            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    DB.session.commit()
+
+
+def add_missing_indexes(model):
+    """
+    Creates the model's indexes that its table doesn't have yet,
+    for tables created before those indexes were declared.
+
+    A unique index the existing rows break is skipped with a warning,
+    so the app still starts. Returns the names of the indexes created.
+    """
+    table    = model.__table__
+    existing = {i['name'] for i in inspect(DB.engine).get_indexes(table.name)}
+    created  = []
+    for index in table.indexes:
+        if index.name in existing:
+            continue
+        try:
+            index.create(DB.engine)
+            created.append(index.name)
+        except IntegrityError as e:
+            # e.g. duplicate usernames from before the unique index.
+            # Remove the duplicates and restart to create it
+            logger.warning("Index %s on %s not created, existing rows break it: %s",
+                           index.name, table.name, e.orig)
+    return created
+
+
+def update_items_db(app, owners):
+    """
+    Updates the foreign keys of many items
+    with one batched UPDATE and one commit.
+
+    owners MUST be a dict:
+        { key: item id, value: (player_id, room_id) }
+    """
+    if not owners:
+        return
+    rows = [{'_id': item_id, 'player_id': player_id, 'room_id': room_id}
+            for item_id, (player_id, room_id) in owners.items()]
+    items = Items.__table__
+    with background_session(app) as session:
+        session.execute(
+            items.update().where(items.c.id == DB.bindparam('_id')), rows)
+        session.commit()
     return
 
 
+class IdBlocks(DB.Model):
+    __tablename__ = 'id_blocks'
+
+    """Next free id of each table whose ids are assigned by the app"""
+    name    = DB.Column(DB.Text, primary_key=True)
+    next_id = DB.Column(DB.Integer, nullable=False)
+
+    def __init__(self, name, next_id):
+        self.name    = name
+        self.next_id = next_id
+
+    def serialize(self):
+        return {
+            'name': self.name,
+            'next_id': self.next_id
+        }
+
+    def __repr__(self):
+        return str(self.serialize())
+
+    def __str__(self):
+        return self.__repr__()
+
+
 class Worlds(DB.Model):
     __tablename__ = 'worlds'
 
@@ -26,6 +273,12 @@ class Worlds(DB.Model):
     id            = DB.Column(DB.Integer, primary_key=True)
     password_salt = DB.Column(DB.LargeBinary, nullable=False)
     map_seed      = DB.Column(DB.Integer)
+    # Chunked worlds only (see `ChunkedRooms.settings`), NULL otherwise
+    size          = DB.Column(DB.Integer, nullable=True)
+    room_limit    = DB.Column(DB.Integer, nullable=True)
+    chunk_size    = DB.Column(DB.Integer, nullable=True)
+    max_chunks    = DB.Column(DB.Integer, nullable=True)
+    first_room_id = DB.Column(DB.Integer, nullable=True)
 
     def __init__(self, password_salt, map_seed):
         self.password_salt = password_salt
@@ -35,14 +288,24 @@ class Worlds(DB.Model):
         return {
             'id': self.id,
             'password_salt': str(self.password_salt),
-            'map_seed': self.map_seed
+            'map_seed': self.map_seed,
+            'size': self.size,
+            'room_limit': self.room_limit,
+            'chunk_size': self.chunk_size,
+            'max_chunks': self.max_chunks,
+            'first_room_id': self.first_room_id
         }
 
     def __repr__(self):
         output = {
             'id': self.id,
             'password_salt': self.password_salt,
-            'map_seed': self.map_seed
+            'map_seed': self.map_seed,
+            'size': self.size,
+            'room_limit': self.room_limit,
+            'chunk_size': self.chunk_size,
+            'max_chunks': self.max_chunks,
+            'first_room_id': self.first_room_id
         }
         return str(output)
 
@@ -55,21 +318,24 @@ class Users(DB.Model):
 
     """Player data"""
     id            = DB.Column(DB.Integer, primary_key=True)
-    username      = DB.Column(DB.Text, nullable=False)
+    username      = DB.Column(DB.Text, nullable=False, unique=True, index=True)
     password_hash = DB.Column(DB.LargeBinary, nullable=False)
     admin_q       = DB.Column(DB.Boolean, nullable=False)
     x             = DB.Column(DB.Integer, nullable=True)
     y             = DB.Column(DB.Integer, nullable=True)
-    highscore     = DB.Column(DB.Integer, nullable=False, default=0)
+    highscore     = DB.Column(DB.Integer, nullable=False, default=0, index=True)
+    world_id      = DB.Column(DB.Integer, DB.ForeignKey('worlds.id'), nullable=True, index=True)
     items         = DB.relationship('Items', backref="player", lazy=True)
 
-    def __init__(self, username, password_hash, admin_q, x, y, items=None, highscore=0):
+    def __init__(self, username, password_hash, admin_q, x, y, items=None, highscore=0,
+                 world_id=None):
         self.username      = username
         self.password_hash = password_hash
         self.admin_q       = admin_q
         self.x             = x
         self.y             = y
         self.highscore     = highscore
+        self.world_id      = world_id
         self.items         = items if items is not None else []
 
     def serialize(self):
@@ -80,6 +346,7 @@ class Users(DB.Model):
             'x': self.x,
             'y': self.y,
             'highscore': self.highscore,
+            'world_id': self.world_id,
             'items': [item.serialize() for item in self.items]
         }
 
@@ -92,6 +359,7 @@ class Users(DB.Model):
             'x': self.x,
             'y': self.y,
             'highscore': self.highscore,
+            'world_id': self.world_id,
             'items': self.items
         }
         return str(output)
@@ -102,6 +370,8 @@ class Users(DB.Model):
 
 class Rooms(DB.Model):
     __tablename__ = 'rooms'
+    # A world's rooms, and its rooms in a chunk's x/y range
+    __table_args__ = (DB.Index('ix_rooms_world_id_x_y', 'world_id', 'x', 'y'),)
 
     """Room data"""
     id          = DB.Column(DB.Integer, primary_key=True)
@@ -109,13 +379,15 @@ class Rooms(DB.Model):
     description = DB.Column(DB.String(256), nullable=True)
     x           = DB.Column(DB.Integer, nullable=True)
     y           = DB.Column(DB.Integer, nullable=True)
+    world_id    = DB.Column(DB.Integer, DB.ForeignKey('worlds.id'), nullable=True)
     items       = DB.relationship('Items', backref="room", lazy=True)
 
-    def __init__(self, name, description, x, y, items=None):
+    def __init__(self, name, description, x, y, items=None, world_id=None):
         self.name        = name
         self.description = description
         self.x           = x
         self.y           = y
+        self.world_id    = world_id
         self.items       = items if items is not None else []
 
     def serialize(self):
@@ -125,6 +397,7 @@ class Rooms(DB.Model):
             'description': self.description,
             'x': self.x,
             'y': self.y,
+            'world_id': self.world_id,
             'items': [item.serialize() for item in self.items]
         }
 
@@ -135,6 +408,7 @@ class Rooms(DB.Model):
             'description': self.description,
             'x': self.x,
             'y': self.y,
+            'world_id': self.world_id,
             'items': self.items
         }
         return str(output)
@@ -151,8 +425,8 @@ class Items(DB.Model):
     name      = DB.Column(DB.Text, nullable=True)
     weight    = DB.Column(DB.Integer, nullable=False)
     score     = DB.Column(DB.Integer, nullable=False)
-    player_id = DB.Column(DB.Integer, DB.ForeignKey('users.id'), nullable=True)
-    room_id   = DB.Column(DB.Integer, DB.ForeignKey('rooms.id'), nullable=True)
+    player_id = DB.Column(DB.Integer, DB.ForeignKey('users.id'), nullable=True, index=True)
+    room_id   = DB.Column(DB.Integer, DB.ForeignKey('rooms.id'), nullable=True, index=True)
 
     def __init__(self, name, weight, score, player_id=None, room_id=None):
         self.name      = name
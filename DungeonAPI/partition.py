@@ -0,0 +1,46 @@
+class Partition:
+    """
+    Splits the world's rooms between `count` workers.
+
+    The grid is cut into `region_size` x `region_size` regions, and every
+    region belongs to exactly one worker. A worker only keeps players
+    standing in its own regions. Players moving into another worker's
+    region are handed off to it (see `url()`).
+
+    index → this worker's number, from 0 to count - 1
+    urls  → every worker's public socket URL, by index
+    """
+
+    def __init__(self, index=0, count=1, region_size=8, urls=None):
+        if not 0 <= index < count:
+            raise ValueError(f"Worker index {index} not in 0..{count - 1}")
+        self.index       = index
+        self.count       = count
+        self.region_size = region_size
+        self.urls        = list(urls or [])
+
+    @property
+    def partitioned(self):
+        return self.count > 1
+
+    def region(self, world_loc):
+        """Returns the (x, y) of the region holding world_loc."""
+        return (world_loc[0] // self.region_size, world_loc[1] // self.region_size)
+
+    def owner(self, world_loc):
+        """Returns the index of the worker owning world_loc."""
+        if self.count == 1:
+            return 0
+        rx, ry = self.region(world_loc)
+        # Spatial hash, so every worker gets regions all over the map
+        return ((rx * 73856093) ^ (ry * 19349663)) % self.count
+
+    def owns(self, world_loc):
+        return self.owner(world_loc) == self.index
+
+    def url(self, index):
+        """Returns the given worker's URL, or None if it isn't known."""
+        return self.urls[index] if index < len(self.urls) else None
+
+    def owner_url(self, world_loc):
+        return self.url(self.owner(world_loc))
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+try:
+    from eventlet import patcher, tpool
+except ImportError:
+    # Not running under eventlet
+    patcher = tpool = None
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords with bcrypt off the event loop.
+
+    Each hash gets its own salt. bcrypt stores the salt in the
+    hash, so `check()` also works on hashes made with a shared salt.
+
+    Under eventlet (monkey patched), the work runs in eventlet's
+    pool of real OS threads (size: EVENTLET_THREADPOOL_SIZE), so other
+    greenlets keep running. Otherwise it runs in a pool of
+    `max_workers` threads.
+
+    max_workers=0 → hash in the caller. Only for tests/benchmarks.
+    """
+
+    def __init__(self, max_workers=4, rounds=12):
+        self.rounds   = rounds
+        self.executor = ThreadPoolExecutor(max_workers) if max_workers else None
+
+    def hash(self, password):
+        """Returns the bcrypt hash of a str password."""
+        return self.__run(bcrypt.hashpw, password.encode(), bcrypt.gensalt(self.rounds))
+
+    def check(self, password, password_hash):
+        """Returns True if the str password matches the hash."""
+        return self.__run(bcrypt.checkpw, password.encode(), bytes(password_hash))
+
+    def __run(self, func, *args):
+        if self.executor is None:
+            return func(*args)
+        if tpool is not None and patcher.is_monkey_patched('thread'):
+            return tpool.execute(func, *args)
+        return self.executor.submit(func, *args).result()
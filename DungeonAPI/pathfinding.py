@@ -0,0 +1,96 @@
+"""
+Paths over a world's room graph.
+
+Rooms next to each other on the grid are always connected (see
+`Room.directions`), so `rooms` only needs to answer `loc in rooms`.
+That keeps ChunkedRooms from loading the chunks a path crosses.
+"""
+import heapq
+from collections import deque
+
+
+def neighbors(rooms, world_loc):
+    x, y = world_loc
+    for loc in ((x, y + 1), (x + 1, y), (x, y - 1), (x - 1, y)):
+        if loc in rooms:
+            yield loc
+
+
+def find_path(rooms, start, goal):
+    """
+    A* with the Manhattan distance, which never overestimates
+    on the grid, so the path found is a shortest one.
+
+    Returns the rooms to walk through after `start`, ending with `goal`:
+        already there → []
+        no way there  → None
+    """
+    if goal not in rooms:
+        return None
+    if start == goal:
+        return []
+
+    def estimate(loc):
+        return abs(loc[0] - goal[0]) + abs(loc[1] - goal[1])
+
+    # came_from { key: world_loc, value: world_loc it was reached from }
+    came_from = {start: None}
+    steps     = {start: 0}
+    # (estimated total, -steps, world_loc). Fewer steps left wins ties
+    frontier  = [(estimate(start), 0, start)]
+    while frontier:
+        _, taken, loc = heapq.heappop(frontier)
+        taken = -taken
+        if loc == goal:
+            return walk_back(came_from, goal)
+        if taken > steps[loc]:
+            # Reached more cheaply since it was queued
+            continue
+        for next_loc in neighbors(rooms, loc):
+            if taken + 1 < steps.get(next_loc, taken + 2):
+                steps[next_loc]     = taken + 1
+                came_from[next_loc] = loc
+                heapq.heappush(frontier, (taken + 1 + estimate(next_loc), -(taken + 1), next_loc))
+    return None
+
+
+def walk_back(came_from, goal):
+    path = []
+    loc  = goal
+    while came_from[loc] is not None:
+        path.append(loc)
+        loc = came_from[loc]
+    path.reverse()
+    return path
+
+
+def nearest_targets(rooms, targets):
+    """
+    Breadth-first search out from every target at once.
+
+    Returns { key: world_loc, value: (steps to the nearest target,
+    next world_loc towards it, or None at a target) } for every
+    room that can reach a target.
+    """
+    found = {loc: (0, None) for loc in targets if loc in rooms}
+    queue = deque(found)
+    while queue:
+        loc = queue.popleft()
+        distance = found[loc][0] + 1
+        for next_loc in neighbors(rooms, loc):
+            if next_loc not in found:
+                found[next_loc] = (distance, loc)
+                queue.append(next_loc)
+    return found
+
+
+def follow(next_steps, start):
+    """Returns the path from start given by `nearest_targets()`, or None."""
+    if start not in next_steps:
+        return None
+    path = []
+    loc  = next_steps[start][1]
+    while loc is not None:
+        path.append(loc)
+        loc = next_steps[loc][1]
+    return path
@@ -1,14 +1,16 @@
 import random
 import uuid
-from threading import Thread
-from flask import current_app
 from flask_socketio import emit
 from .item import Trash
 from .room import Store
-from .models import update_items_db
 
 
 class Player:
+
+    __slots__ = ('id', 'username', '__auth_key', 'password_hash', 'uuid', 'admin_q',
+                 'world', 'world_loc', 'max_weight', 'highscore', 'items',
+                 'dirty_items', 'user_changed')
+
     def __init__(self, world, id, name, world_loc, password_hash, auth_key=None, highscore=0, admin_q=False, items=None):
         self.id            = id
         self.username      = name
@@ -24,6 +26,10 @@ class Player:
         # Inventory { key: Item.id, value: Item }
         self.items         = items if items is not None else {}
 
+        # Changes since the last World.flush_changes()
+        self.dirty_items   = set()  # Item ids picked up
+        self.user_changed  = False  # world_loc or highscore changed
+
     @property
     def weight(self):
         total_weight = 0
@@ -53,6 +59,23 @@ class Player:
         """
         return self.world.rooms.get(self.world_loc, None)
 
+    def mark_dirty(self, item_id=None):
+        """
+        Flags the player to be written by `World.flush_changes()`
+
+        With an item_id, flags that item as picked up.
+        Without, flags the player's location/highscore.
+        """
+        if item_id is None:
+            self.user_changed = True
+        else:
+            self.dirty_items.add(item_id)
+        self.world.dirty_players.add(self)
+
+    def clear_dirty(self):
+        self.dirty_items  = set()
+        self.user_changed = False
+
     def __generate_auth_key():
         digits = ['0', '1', '2', '3', '4', '5', '6',
                   '7', '8', '9', 'a', 'b', 'c', 'd', 'e', 'f']
@@ -64,16 +87,28 @@ class Player:
     def travel(self, direction, show_rooms=False):
         next_room = self.current_room.get_room_in_direction(direction)
         if next_room is not None:
-            next_room.check_inventory_reset()
+            # Inventories are reset in the background (see InventoryResetter)
             self.world_loc = next_room.world_loc
+            self.mark_dirty()
             return True
         else:
             return False
 
+    def travel_to(self, world_loc):
+        """
+        Moves straight to a room, at the end of a path
+        from `World.find_path()` or `World.path_to_store()`.
+        """
+        if world_loc not in self.world.rooms:
+            return False
+        self.world_loc = tuple(world_loc)
+        self.mark_dirty()
+        return True
+
     def drop_item(self, item_id):
         """
         Drops an item in the room.
-        When successful, creates thread to update item in DB.
+        When successful, queues the item's update for the DB.
 
         Returns:
             player doesn't have item → False
@@ -83,15 +118,14 @@ class Player:
             return False
         item = self.items.pop(item_id)
         self.current_room.add_item(item)
-        Thread(target=update_items_db, args=(current_app._get_current_object(), [
-               item.id], None, self.current_room.id)).start()
+        self.world.queue_item_update([item.id], None, self.current_room.id)
         article = "some" if isinstance(item, Trash) else "a"
         return f"{self.username} dropped {article} {item.name}"
 
     def barter(self, item_ids, store_item_id):
         """
         Sells several items to a store.
-        When successful, creates thread to update items in DB.
+        When successful, queues the items' update for the DB.
 
         Returns:
             player doesn't have item ids → False
@@ -121,15 +155,14 @@ class Player:
         for item_id in item_ids:
             item = self.items.pop(item_id)
             self.current_room.add_item(item)
-        Thread(target=update_items_db, args=(current_app._get_current_object(),
-                                             item_ids, None, self.current_room.id)).start()
+        self.world.queue_item_update(item_ids, None, self.current_room.id)
         message = self.take_item(store_item_id)
         return {'chat': f"{self.username} bartered at the store"}
 
     def take_item(self, item_id):
         """
         Takes an item from the room.
-        When successful, creates thread to update items in DB.
+        When successful, queues the items' update for the DB.
 
         If the player's new score is greater than the highscore,
         also updates highscore.
@@ -146,11 +179,12 @@ class Player:
             return False
         item = self.current_room.remove_item(item_id)
         self.items[item.id] = item
+        self.mark_dirty(item.id)
         if self.score > self.highscore:
             self.highscore = self.score
+            self.mark_dirty()
             self.world.confirm_highscores(self)
-        Thread(target=update_items_db, args=(
-            current_app._get_current_object(), [item.id], self.id, None)).start()
+        self.world.queue_item_update([item.id], self.id, None)
         article = "some" if isinstance(item, Trash) else "a"
         return f"{self.username} took {article} {item.name}"
 
@@ -0,0 +1,167 @@
+from .world import World
+from .models import Worlds, Rooms, Users, Items
+
+
+class WorldRegistry:
+    """
+    Every World this server runs, keyed by world id.
+
+    The main world (the first one loaded or added) is where
+    players go unless they ask for another world. Event worlds can
+    be added and removed while the server runs, without touching
+    the main world or its players.
+
+    setup    → called with each World the registry loads or builds,
+               to give it the app's writer/hasher/leaderboard.
+    item_ids → `IdAllocator` shared by every world. Worlds keep
+               their own if not given.
+    """
+
+    def __init__(self, setup=None, item_ids=None):
+        # worlds  { key: World.id,  value: World }
+        # players { key: socket id, value: World the player is in }
+        self.worlds   = {}
+        self.players  = {}
+        self.main     = None
+        self.setup    = setup
+        self.item_ids = item_ids
+
+    def __iter__(self):
+        return iter(self.worlds.values())
+
+    def __len__(self):
+        return len(self.worlds)
+
+    def get(self, world_id):
+        return self.worlds.get(world_id)
+
+    def add(self, world):
+        """Adds a World. The first one added becomes the main world."""
+        self.worlds[world.id] = world
+        if self.main is None:
+            self.main = world
+        return world
+
+    def load_from_db(self, DB):
+        """Loads every world in the database. Returns the number loaded."""
+        loaded = 0
+        for world_id, in DB.session.query(Worlds.id).order_by(Worlds.id).all():
+            if world_id in self.worlds:
+                continue
+            world = World(id=world_id)
+            if self.setup is not None:
+                self.setup(world)
+            world.load_from_db(DB)
+            self.add(world)
+            loaded += 1
+        return loaded
+
+    def create(self, DB, seed=None, **options):
+        """
+        Builds, saves and adds a new world.
+
+        options → passed on to `World.create_world()` (size, room_limit, ...)
+        """
+        world = World(id=None)
+        if self.item_ids is not None:
+            world.item_ids = self.item_ids
+        world.create_world(seed, **options)
+        world.save_to_db(DB)
+        # After saving, so the world has its id
+        if self.setup is not None:
+            self.setup(world)
+        return self.add(world)
+
+    def remove(self, DB, world_id):
+        """
+        Tears down a world that isn't the main one:
+            - its online players are saved and logged out
+            - its rooms, their items and its worlds row are deleted
+            - its users go back to the main world on their next login
+
+        Returns the removed World, or None if it isn't here.
+        """
+        world = self.worlds.get(world_id)
+        if world is None or world is self.main:
+            return None
+
+        for player in list(world.players.values()):
+            self.save_player(player)
+        world.leaderboard.stop()
+        if world.item_writer is not None:
+            world.item_writer.flush()
+        try:
+            own_rooms = DB.session.query(Rooms.id).filter(Rooms.world_id == world.id)
+            Items.query.filter(Items.room_id.in_(own_rooms)).delete(
+                synchronize_session=False)
+            Rooms.query.filter(Rooms.world_id == world.id).delete(synchronize_session=False)
+            Users.query.filter(Users.world_id == world.id).update(
+                {'world_id': None}, synchronize_session=False)
+            Worlds.query.filter_by(id=world.id).delete(synchronize_session=False)
+            DB.session.commit()
+        except Exception:
+            DB.session.rollback()
+            raise
+        return self.worlds.pop(world.id)
+
+    def get_player_by_auth(self, auth_key):
+        world = self.players.get(auth_key)
+        if world is None:
+            return None
+        # Gone if the world was reloaded since
+        return world.get_player_by_auth(auth_key)
+
+    def get_player_by_username(self, username):
+        for world in self.worlds.values():
+            player = world.get_player_by_username(username)
+            if player is not None:
+                return player
+        return None
+
+    def add_player(self, username, password1, password2, socketid=None, world_id=None):
+        """
+        Registers a new player in the given world (the main one by default).
+
+        Returns the same as `World.add_player()`.
+        """
+        world = self.main if world_id is None else self.worlds.get(world_id)
+        if world is None:
+            return {'error': 'Invalid world'}
+        response = world.add_player(username, password1, password2, socketid)
+        if 'key' in response:
+            self.players[response['key']] = world
+        return response
+
+    def load_player_from_db(self, username, password, socketid, trusted=False, world_id=None):
+        """
+        Logs a user in to the given world. Without a world_id,
+        they go back to the world they were last in, or the
+        main world if it's gone.
+
+        Returns the same as `World.load_player_from_db()`.
+        """
+        user = Users.query.filter_by(username=username).first()
+        if user is None:
+            return {'error': 'Invalid username'}
+        if world_id is None:
+            world = self.worlds.get(user.world_id, self.main)
+        else:
+            world = self.worlds.get(world_id)
+            if world is None:
+                return {'error': 'Invalid world'}
+        # Password first, so only the user can tell they're online
+        if not trusted and not world.hasher.check(password, user.password_hash):
+            return {'error': 'Invalid password'}
+        if self.get_player_by_username(username) is not None:
+            return {'error': 'User is already logged in'}
+
+        # Checked above, so the world doesn't hash the password again
+        response = world.load_player_from_db(username, password, socketid, trusted=True)
+        if 'key' in response:
+            self.players[response['key']] = world
+        return response
+
+    def save_player(self, player):
+        """Saves the player to the DB and logs them out of their world."""
+        player.world.save_player_to_db(player)
+        self.players.pop(player.auth_key, None)
@@ -1,11 +1,19 @@
 import random
+from collections import deque
 from datetime import datetime, timedelta
-from .item import Item, Trash, Stick, Gem, Hammer, db_to_class
-from .models import DB, Items
+from .item import Item, Trash, Stick, Gem, Hammer, db_to_class, item_row, random_candidates, build_items
+from .models import DB, Items, Rooms, bulk_insert, upsert, sync_id_sequence, BULK_INSERT_BATCH
+
+# Item changes each room remembers for `Room.delta_since()`
+CHANGE_LOG_SIZE = 16
 
 
 class Room:
 
+    __slots__ = ('id', 'world', 'name', 'description', 'world_loc', 'loc_name',
+                 'last_reset', 'minutes_to_wait', 'item_max', 'items', 'exits',
+                 'dirty_items', 'version', 'changes', '__serialized')
+
     def __init__(self, world, name, description, world_loc, loc_name=None, id=0, items=None, minutes_to_wait=20, item_max=10):
         self.id              = id
         self.world           = world
@@ -17,15 +25,87 @@ class Room:
         self.minutes_to_wait = minutes_to_wait
         self.item_max        = item_max
         self.items           = items if items is not None else {}
+        # exits { key: direction, value: Room }, None until link_exits()
+        self.exits           = None
+        # Item ids added since the last World.flush_changes()
+        self.dirty_items     = set()
+        # Bumped whenever the serialized room changes
+        self.version         = 0
+        # changes: deque of (version, ('added', Item) or ('removed', item id)),
+        # None when the last change can't be sent as a delta
+        self.changes         = None
+        self.__serialized    = None
 
     def serialize(self):
+        """
+        Returns the room for the FE.
+
+        The result is cached and shared by every caller until
+        `invalidate()` is called, so it must NOT be modified.
+        """
+        if self.__serialized is None:
+            self.__serialized = {
+                "id": self.id,
+                "name": self.name,
+                "description": self.description,
+                "world_loc": self.world_loc,
+                "items": self.item_coords(),
+                "direction": self.directions,
+                "version": self.version
+            }
+        return self.__serialized
+
+    def invalidate(self, change=None):
+        """
+        Drops the cached `serialize()` result. Call after changing items.
+
+        change → ('added', Item) or ('removed', item id), remembered
+                 for `delta_since()`. Any other change can only be
+                 sent as a full snapshot.
+        """
+        self.version += 1
+        self.__serialized = None
+        if change is None:
+            self.changes = None
+        else:
+            if self.changes is None:
+                self.changes = deque(maxlen=CHANGE_LOG_SIZE)
+            self.changes.append((self.version, change))
+
+    def delta_since(self, version):
+        """
+        Returns the items added/removed since the given version:
+            {
+                'id': room id, 'from': version, 'version': current version,
+                'added': [(coords, item), ...], 'removed': [item id, ...]
+            }
+        Removals apply before additions.
+
+        Returns None if the changes since then aren't all
+        remembered, so a full `serialize()` must be sent instead.
+        """
+        if version > self.version:
+            return None
+        if version < self.version:
+            if not self.changes or self.changes[0][0] > version + 1:
+                return None
+        added, removed = {}, []
+        for change_version, (kind, value) in self.changes or ():
+            if change_version <= version:
+                continue
+            if kind == 'added':
+                added[value.id] = value
+            elif value in added:
+                # Came and went since then
+                del added[value]
+            else:
+                removed.append(value)
         return {
-            "id": self.id,
-            "name": self.name,
-            "description": self.description,
-            "world_loc": self.world_loc,
-            "items": self.item_coords(),
-            "direction": self.directions
+            'id': self.id,
+            'from': version,
+            'version': self.version,
+            'added': [(self.get_item_coords(i), i.serialize()) for i in added.values()],
+            'removed': removed
         }
 
     def __repr__(self):
@@ -42,14 +122,39 @@ class Room:
 
     @property
     def directions(self):
+        if self.exits is not None:
+            return list(self.exits)
         dir_list = []
-        for d in "nesw":
-            if self.get_room_in_direction(d) is not None:
+        x, y = self.world_loc
+        neighbor_locs = (('n', (x, y + 1)), ('e', (x + 1, y)),
+                         ('s', (x, y - 1)), ('w', (x - 1, y)))
+        for d, loc in neighbor_locs:
+            # Membership only, so chunked worlds don't load the neighbor
+            if loc in self.world.rooms:
                 dir_list.append(d)
         return dir_list
 
+    def link_exits(self, rooms):
+        """
+        Stores direct references to the neighboring rooms,
+        so moving and serializing don't need coordinate lookups.
+
+        rooms → the world's { key: world_loc, value: Room } dict
+        """
+        x, y = self.world_loc
+        neighbor_locs = {
+            'n': (x, y + 1),
+            'e': (x + 1, y),
+            's': (x, y - 1),
+            'w': (x - 1, y)
+        }
+        self.exits = {d: rooms[loc] for d, loc in neighbor_locs.items() if loc in rooms}
+        self.invalidate()
+
     def get_room_in_direction(self, direction):
-        if direction == 'n':
+        if self.exits is not None:
+            return self.exits.get(direction, None)
+        elif direction == 'n':
             return self.world.rooms.get((self.world_loc[0], self.world_loc[1] + 1), None)
         elif direction == 's':
             return self.world.rooms.get((self.world_loc[0], self.world_loc[1] - 1), None)
@@ -75,8 +180,19 @@ class Room:
         if not item or not item.id:
             return False
         self.items[item.id] = item
+        self.mark_dirty(item.id)
+        self.invalidate(('added', item))
         return True
 
+    def mark_dirty(self, item_id):
+        """Flags an item in this room to be written by `World.flush_changes()`"""
+        self.dirty_items.add(item_id)
+        if self.world is not None:
+            self.world.dirty_rooms.add(self)
+
+    def clear_dirty(self):
+        self.dirty_items = set()
+
     def get_item_weight(self, item_id):
         item = self.items.get(item_id, None)
         if item is None:
@@ -85,36 +201,26 @@ class Room:
             return item.weight
 
     def remove_item(self, item_id):
-        return self.items.pop(item_id)
-
-    def set_inventory(self):
-        """Resets a Room's inventory based to its max capacity"""
-        potential_items = [Trash(random.randint(0, 10**8)) for _ in range(10)]
-        potential_items += [Stick(random.randint(0, 10**8)) for _ in range(10)]
-        potential_items += [Hammer(random.randint(0, 10**8)) for _ in range(5)]
-        potential_items += [Gem(random.randint(0, 10**8)) for _ in range(1)]
-
-        inventory = [i for i in random.choices(
-            potential_items, k=self.item_max)]
-        Items.query.filter_by(room_id=self.id).delete()
-        DB.session.commit()
-        items = [Items(i.name, i.weight, i.score, room_id=self.id)
-                 for i in inventory]
-        DB.session.bulk_save_objects(items)
-        DB.session.commit()
-        items = Items.query.filter_by(room_id=self.id).all()
-        self.items = {i.id: db_to_class(i) for i in items}
-
-    def check_inventory_reset(self):
-        now = datetime.now()
+        item = self.items.pop(item_id)
+        self.invalidate(('removed', item_id))
+        return item
+
+    def roll_inventory(self):
+        """Returns a random new inventory, as `random_candidates()` picks."""
+        potential_items = random_candidates(
+            [(Trash, 10), (Stick, 10), (Hammer, 5), (Gem, 1)])
+        return random.choices(potential_items, k=self.item_max)
+
+    def needs_reset(self, now):
+        """True if the room is due for a new inventory (see `reset_inventories`)."""
         reset_time = self.last_reset + timedelta(minutes=self.minutes_to_wait)
-        if now > reset_time and (len(self.items) < self.item_max // 2 or len(self.items) > 35):
-            self.last_reset = now
-            self.set_inventory()
+        return now > reset_time and (len(self.items) < self.item_max // 2 or len(self.items) > 35)
 
 
 class Tunnel(Room):
 
+    __slots__ = ()
+
     def __init__(self, world, world_loc, loc_name=None, id=0, items=None):
         name        = f"Tunnel segment {world_loc[0]}-{world_loc[1]}"
         description = "An underground tunnel. Where does it lead? Continue to find out!"
@@ -124,6 +230,8 @@ class Tunnel(Room):
 
 class DeadEnd(Room):
 
+    __slots__ = ()
+
     def __init__(self, world, world_loc, loc_name=None, id=0, items=None):
         name = f"Dead end {world_loc[0]}-{world_loc[1]}"
         description = "A dead end. Some thoughtless ant built a tunnel to nowhere! Better turn around."
@@ -133,39 +241,26 @@ class DeadEnd(Room):
 
 class Store(Room):
 
+    __slots__ = ()
+
     def __init__(self, world, world_loc, loc_name=None, id=0, items=None):
         name = "Ant Store"
         description = "A fabulous store where you can buy all things ant!"
         super().__init__(world, name, description, world_loc,
                          loc_name, id, items, minutes_to_wait=15)
         if items is None:
-            self.set_inventory(reset=None)
-
-    def set_inventory(self, reset=None):
-        potential_inventory = [
-            [Trash(random.randint(0, 10**8)) for _ in range(15)],
-            [Stick(random.randint(0, 10**8)) for _ in range(15)],
-            [Gem(random.randint(0, 10**8)) for _ in range(15)],
-            [Hammer(random.randint(0, 10**8)) for _ in range(15)]
-        ]
-        inventory = random.choice(potential_inventory)
-        if reset:
-            Items.query.filter_by(room_id=self.id).delete()
-            DB.session.commit()
-            items = [Items(i.name, i.weight, i.score, room_id=self.id)
-                     for i in inventory]
-            DB.session.bulk_save_objects(items)
-            DB.session.commit()
-            items = Items.query.filter_by(room_id=self.id).all()
-            self.items = {i.id: db_to_class(i) for i in items}
-        else:
-            self.items = {i.id: db_to_class(i) for i in inventory}
+            self.items = build_items(self.roll_inventory(),
+                                     world.item_ids if world is not None else None)
+
+    def roll_inventory(self):
+        potential_items = random_candidates(
+            [(Trash, 15), (Stick, 15), (Gem, 15), (Hammer, 15)])
+        # Choose one kind of item to stock
+        start = random.choice(range(0, 60, 15))
+        return potential_items[start:start + 15]
 
-    def check_inventory_reset(self):
-        now = datetime.now()
-        if now > self.last_reset + timedelta(minutes=self.minutes_to_wait):
-            self.last_reset = now
-            self.set_inventory(True)
+    def needs_reset(self, now):
+        return now > self.last_reset + timedelta(minutes=self.minutes_to_wait)
 
     def barter_item(self, item_id, barter_value):
         item = self.items.get(item_id)
@@ -189,3 +284,123 @@ def room_db_to_class(world, model_info, items):
     else:
         return Room(world, model_info.name, model_info.description, world_loc,
                     id=model_info.id, items=items)
+
+
+def rooms_to_db(rooms, renumber=False):
+    """
+    Inserts the given rooms and all of their items
+    with batched INSERTs. Does NOT commit.
+
+    Rooms must already have their ids set. Items keep theirs.
+
+    renumber → for items whose ids weren't reserved from the DB
+               (see `IdAllocator`). Items are given new ids above the
+               highest id in the items table, and each room's `items`
+               dict is rebuilt to match.
+    """
+    if renumber:
+        next_item_id = (DB.session.query(DB.func.max(Items.id)).scalar() or 0) + 1
+    room_rows, item_rows = [], []
+
+    for r in rooms:
+        room_rows.append({
+            'id': r.id,
+            'name': r.name,
+            'description': r.description,
+            'x': r.world_loc[0],
+            'y': r.world_loc[1],
+            'world_id': r.world.id
+        })
+        if renumber:
+            items = {}
+            for i in r.items.values():
+                i.id = next_item_id
+                next_item_id += 1
+                items[i.id] = i
+            r.items = items
+            r.invalidate()
+        item_rows.extend(item_row(i, room_id=r.id) for i in r.items.values())
+
+    bulk_insert(Rooms, room_rows)
+    bulk_insert(Items, item_rows)
+    sync_id_sequence(Rooms)
+    sync_id_sequence(Items)
+
+
+def reset_inventories(rooms, now=None, session=None):
+    """
+    Gives every room a new inventory (see `Room.roll_inventory`),
+    in one transaction: a DELETE for the rooms' old items and
+    batched INSERTs for the new ones, with ids from `world.item_ids`.
+
+    Each room's `items` dict is swapped for the new one after the
+    commit. Items dropped in a room while the transaction ran are
+    kept, and upserted again in a second commit, as the DELETE may
+    have removed their rows. Commits the session (DB.session by default).
+
+    Returns the number of new items.
+    """
+    now     = now or datetime.now()
+    session = session or DB.session
+    resets, room_ids, item_rows = [], [], []
+
+    for room in rooms:
+        snapshot = set(room.items)
+        room_ids.append(room.id)
+        items = build_items(room.roll_inventory(), room.world.item_ids)
+        item_rows.extend(item_row(item, room_id=room.id) for item in items.values())
+        resets.append((room, snapshot, items))
+
+    try:
+        for start in range(0, len(room_ids), BULK_INSERT_BATCH):
+            session.query(Items).filter(Items.room_id.in_(room_ids[start:start + BULK_INSERT_BATCH])) \
+                                .delete(synchronize_session=False)
+        bulk_insert(Items, item_rows, session=session)
+        sync_id_sequence(Items, session)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    kept_rows = []
+    for room, snapshot, items in resets:
+        kept = [i for id, i in room.items.items() if id not in snapshot]
+        kept_rows.extend(item_row(item, room_id=room.id) for item in kept)
+        items.update({item.id: item for item in kept})
+        room.items      = items
+        room.last_reset = now
+        room.invalidate()
+
+    if kept_rows:
+        try:
+            upsert(Items, kept_rows, session=session)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+    return len(item_rows)
+
+
+def rooms_from_db(world, *criteria):
+    """
+    Loads the world's rooms matching the criteria (all of them
+    by default) with their items, in two queries.
+
+    Returns { key: world_loc, value: Room }
+    """
+    # Plain column rows: no ORM objects to build or track
+    criteria = (Rooms.world_id == world.id, *criteria)
+    items_by_room = {}
+    db_items = DB.session.query(Items.id, Items.name, Items.weight,
+                                Items.score, Items.room_id)
+    db_items = db_items.join(Rooms, Items.room_id == Rooms.id).filter(*criteria)
+    for i in db_items:
+        items_by_room.setdefault(i.room_id, {})[i.id] = db_to_class(i)
+
+    rooms = {}
+    db_rooms = DB.session.query(Rooms.id, Rooms.name, Rooms.description,
+                                Rooms.x, Rooms.y).filter(*criteria)
+    for r in db_rooms:
+        room = room_db_to_class(world, r, items_by_room.get(r.id, {}))
+        rooms[room.world_loc] = room
+    return rooms
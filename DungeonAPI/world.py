@@ -1,29 +1,53 @@
 import random
 import math
 import bcrypt
-from flask_socketio import emit
 from decouple import config
+from sqlalchemy.exc import IntegrityError
 
-from .room import room_db_to_class, Store
+from .room import room_db_to_class, rooms_to_db, rooms_from_db, Store
+from .chunks import ChunkedRooms
+from .encoding import pack_map
+from .pathfinding import find_path, nearest_targets, follow
 from .player import Player
 from .map import Map
-from .item import db_to_class
+from .leaderboard import Leaderboard
+from .passwords import PasswordHasher
+from .partition import Partition
+from .ids import IdAllocator
+from .item import db_to_class, item_row
 
 from .models import *
 
 
 class World:
 
-    def __init__(self, map_seed=16358):
+    def __init__(self, map_seed=16358, id=1):
+        # id: the world's row in the worlds table. None → a new row on save_to_db()
         # rooms   { key: Room.world_loc,  value: Room }
         # players { key: Player.auth_key, value: Player }
+        # players_by_username { key: Player.username, value: Player }
+        # dirty_rooms/dirty_players: changed since the last flush_changes()
 
+        # Only kept for the worlds table. Each password has its own salt
+        self.id            = id
         self.password_salt = bcrypt.gensalt()
+        self.hasher        = PasswordHasher()
         self.rooms         = {}
         self.players       = {}
-        self.highscores    = [None, None, None]
+        self.players_by_username = {}
+        self.leaderboard   = Leaderboard()
         self.loaded        = False
         self.map_seed      = map_seed
+        self.dirty_rooms   = set()
+        self.dirty_players = set()
+        self.item_writer   = None  # ItemWriter, set up by create_app()
+        self.partition     = Partition()
+        # Ids for new items. create_app() shares one reserving them from the DB
+        self.item_ids      = IdAllocator()
+        # (rooms it was built from, pack_map() result)
+        self.__packed_map  = None
+        # (rooms it was built from, nearest_targets() to the stores)
+        self.__store_paths = None
 
     def add_player(self, username, password1, password2, socketid=None):
         """
@@ -47,140 +71,172 @@ class World:
         if user is not None:
             return {'error': "Username already exists"}
 
-        password_hash = bcrypt.hashpw(password1.encode(), self.password_salt)
-        world_loc = random.choice(list(self.rooms.keys()))
+        password_hash = self.hasher.hash(password1)
+        # New players start in one of this worker's rooms
+        world_loc = random.choice([loc for loc in self.rooms.keys()
+                                   if self.partition.owns(loc)] or list(self.rooms.keys()))
 
         # Add user to DB first to get player id
         new_user = Users(username, password_hash, username == config("ADMIN_USERNAME"),
-                         world_loc[0], world_loc[1])
+                         world_loc[0], world_loc[1], world_id=self.id)
         DB.session.add(new_user)
-        DB.session.commit()
+        try:
+            DB.session.commit()
+        except IntegrityError:
+            # Registered by someone else since the check above
+            DB.session.rollback()
+            return {'error': "Username already exists"}
         player = Player(self, new_user.id, username, world_loc, password_hash,
                         auth_key=socketid, admin_q=new_user.admin_q)
 
-        self.players[player.auth_key] = player
+        self.add_online_player(player)
         return {'message': 'Player registered', 'key': player.auth_key}
 
+    def queue_item_update(self, item_ids, player_id, room_id):
+        """
+        Queues new item owners to be written to the DB by `item_writer`.
+
+        Without an item_writer, the changes are only written
+        by the next `flush_changes()` or `save_to_db()`.
+        """
+        if self.item_writer is not None:
+            self.item_writer.put(item_ids, player_id, room_id)
+
     def get_player_by_auth(self, auth_key):
         return self.players.get(auth_key, None)
 
     def get_player_by_username(self, username):
-        for auth_key in self.players:
-            if self.players[auth_key].username == username:
-                return self.players[auth_key]
-        return None
+        return self.players_by_username.get(username, None)
 
-    def load_player_from_db(self, username, password, socketid):
+    def add_online_player(self, player):
+        """Adds the player to `players` and `players_by_username`."""
+        self.players[player.auth_key] = player
+        self.players_by_username[player.username] = player
+
+    def remove_online_player(self, player):
+        """Removes the player from `players` and `players_by_username`."""
+        self.players.pop(player.auth_key, None)
+        if self.players_by_username.get(player.username) is player:
+            self.players_by_username.pop(player.username)
+
+    def load_player_from_db(self, username, password, socketid, trusted=False):
+        """
+        Logs a user in as a player in this world.
+
+        trusted → skips the password check. Only for players
+                  handed off by another worker (see `Partition`).
+
+        Returns:
+            - success            → {'key': player.auth_key}
+            - owned elsewhere    → {'redirect': worker url, 'worker': index}
+            - error              → {'error': error}
+        """
         user = Users.query.filter_by(username=username).first()
         if user is None:
             return {'error': 'Invalid username'}
-        password_hash = bcrypt.hashpw(password.encode(), self.password_salt)
-        if user.password_hash != password_hash:
+        if not trusted and not self.hasher.check(password, user.password_hash):
             return {'error': 'Invalid password'}
+        if username in self.players_by_username:
+            return {'error': 'User is already logged in'}
 
         world_loc = (user.x, user.y)
+        if world_loc not in self.rooms:
+            # The user was last in another world
+            world_loc = random.choice([loc for loc in self.rooms.keys()
+                                       if self.partition.owns(loc)] or list(self.rooms.keys()))
+        if not self.partition.owns(world_loc):
+            owner = self.partition.owner(world_loc)
+            return {'redirect': self.partition.url(owner), 'worker': owner}
         items = {i.id: db_to_class(i) for i in user.items}
         player = Player(self, user.id, user.username, world_loc,
                         user.password_hash, auth_key=socketid, admin_q=user.admin_q, items=items, highscore=user.highscore)
-        self.players[player.auth_key] = player
+        self.add_online_player(player)
         return {'message': 'logged in', 'key': player.auth_key}
 
     def save_player_to_db(self, player):
         """Saves player to db, and sets all items to have player's foreign key"""
+        self.save_players_to_db([player])
+        self.remove_online_player(player)
 
-        # Get user from DB
-        user = Users.query.filter_by(username=player.username).first()
-        new_user = False
-        if user is None:
-            # No user? Create one
-            new_user = True
-            user = Users(player.username, player.password_hash, player.admin_q,
-                         player.world_loc[0], player.world_loc[1], highscore=player.highscore)
-        else:
-            # Is a user? Update these values
-            user.x         = player.world_loc[0]
-            user.y         = player.world_loc[1]
-            user.highscore = player.highscore
-
-        # Resets items from db, and only assigns items that the player has
-        for i in user.items:
-            i.player_id = None
-        if new_user:
-            DB.session.add(user)
-        DB.session.commit()  # Ensure that our user object has a proper id
-
-        for i in player.items.values():
-            # Get item from db
-            item = Items.query.filter_by(id=i.id).first()
-            new_item = False
-            if item is None:
-                # No item? Create a new one
-                new_item = True
-                item = Items(i.name, i.weight, i.score, player_id=user.id)
-            else:
-                # Yes item? Update these values
-                item.player_id = user.id
-                item.room_id = None
-            if new_item:
-                DB.session.add(item)
-        DB.session.commit()  # Save DB changes
-        self.players.pop(player.auth_key)
+    def save_players_to_db(self, players, session=None):
+        """
+        Saves many online players in one transaction:
+            - one UPDATE clearing the items they held in the DB
+            - one upsert of the items they hold now
+              (recreating missing rows with their own ids)
+            - one batched users UPDATE for location/highscore/world
+
+        Players stay online. Their dirty flags are cleared before
+        writing, so changes made meanwhile are saved next time.
+        Commits the session (DB.session by default).
+
+        Returns the number of players saved.
+        """
+        session = session or DB.session
+        players = list(players)
+        if not players:
+            return 0
+        for player in players:
+            player.clear_dirty()
+            self.dirty_players.discard(player)
+
+        item_rows = [item_row(item, player_id=player.id)
+                     for player in players for item in player.items.values()]
+        user_rows = [{
+            '_id': player.id,
+            'x': player.world_loc[0],
+            'y': player.world_loc[1],
+            'highscore': player.highscore,
+            'world_id': self.id
+        } for player in players]
+
+        items, users = Items.__table__, Users.__table__
+        try:
+            session.execute(
+                items.update().where(items.c.player_id.in_([p.id for p in players]))
+                              .values(player_id=None))
+            upsert(Items, item_rows, session=session)
+            session.execute(
+                users.update().where(users.c.id == DB.bindparam('_id')), user_rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            for player in players:
+                player.mark_dirty()
+            raise
+        return len(players)
 
     def confirm_highscores(self, player, single_socket=False):
         """
-        Checks the player's highscore with the top three.
+        Records the player's highscore on the leaderboard.
+
+        If the leaderboard changes, it is sent to all players
+        (see `Leaderboard`).
 
-        If the player is in the top three, update the values
-        and send to all players.
+        single_socket → someone just loaded into the world.
+                        Returns the highscores to send only to them.
+        """
+        changed = self.leaderboard.update(player.id, player.username, player.highscore)
+        if changed and self.partition.partitioned:
+            # Other workers pick the new highscore up from the DB
+            Users.query.filter(Users.id == player.id, Users.highscore < player.highscore) \
+                       .update({'highscore': player.highscore})
+            DB.session.commit()
+        if single_socket:
+            return self.leaderboard.serialize()
 
-        emits "highscoreupdate"
+    def socket_room(self, world_loc=None, deltas=False):
         """
-        send_scores = False
-
-        in_highscores = False
-        for i in range(len(self.highscores)):
-            # Check whether our current player is
-            # already in our highscore roster
-            if isinstance(self.highscores[i], Player) and self.highscores[i].id == player.id:
-                in_highscores = True
-                self.highscores[i] = player
-
-        if in_highscores:
-            # If the player is in the highscores array
-            # loop through the array to update player order
-            send_scores = True
-            for i in range(2, 0, -1):
-                if self.highscores[i - 1] is None or (self.highscores[i] and self.highscores[i].highscore > self.highscores[i - 1].highscore):
-                    # If the compare value is None, or
-                    # our current highscore is greater than compared highscore
-                    # swap.
-                    temp = self.highscores[i]
-                    self.highscores[i] = self.highscores[i - 1]
-                    self.highscores[i - 1] = temp
+        Returns the socket room name for a room in this world,
+        or for everyone in this world if world_loc is None.
 
-        else:
-            # If the player is not in the highscores,
-            # Check if their highscore places them in the top three
-            for i in range(3):
-                if self.highscores[i] is None or player.highscore > self.highscores[i].highscore:
-                    # If you find a highscore lower than the player, or
-                    # the compared spot is None, stick the player in there
-                    send_scores = True
-                    temp = player
-                    player = self.highscores[i]
-                    self.highscores[i] = temp
-
-        if send_scores or single_socket:
-            # If our highscore values changed,
-            # send the new highscore info to everyone
-            send_highscores = [
-                f"{p.username} {p.highscore}" for p in self.highscores if isinstance(p, Player)]
-            if single_socket:
-                # Single socket → someone just loaded into the world.
-                # return the highscores so they will be sent only to the player
-                return send_highscores
-            else:
-                emit("highscoreupdate", send_highscores, broadcast=True)
+        deltas → the room's sockets that get "roomdelta" updates
+                 instead of full "roomupdate" snapshots.
+        """
+        if world_loc is None:
+            return f"world-{self.id}"
+        name = f"world-{self.id}:{world_loc[0]},{world_loc[1]}"
+        return f"{name}/delta" if deltas else name
 
     def get_map_info(self):
         """
@@ -190,6 +246,9 @@ class World:
             - coordinates where rooms exist
             - coordinates where stores are
         """
+        if isinstance(self.rooms, ChunkedRooms):
+            return {"rooms": list(self.rooms.keys()), "stores": self.rooms.store_locs()}
+
         rooms, stores = [], []
         for room_coord in self.rooms.keys():
             if isinstance(self.rooms[room_coord], Store):
@@ -198,74 +257,232 @@ class World:
 
         return {"rooms": rooms, "stores": stores}
 
-    def create_world(self, seed=None):
+    def get_packed_map_info(self):
+        """
+        Returns `get_map_info()` packed by `pack_map()`, for compact clients.
+
+        Built once per map. A new world or reload replaces
+        self.rooms, which builds it again.
+        """
+        if self.__packed_map is None or self.__packed_map[0] is not self.rooms:
+            self.__packed_map = (self.rooms, pack_map(self.get_map_info()))
+        return self.__packed_map[1]
+
+    def find_path(self, start, goal):
+        """
+        Returns the shortest list of rooms to walk through from start
+        to goal (see `pathfinding.find_path()`), or None if there's no way.
+        """
+        return find_path(self.rooms, tuple(start), tuple(goal))
+
+    def path_to_store(self, start):
+        """
+        Returns the shortest path from start to the nearest store,
+        like `find_path()`.
+
+        The distance from every room to its nearest store is worked out
+        once per map, so this only follows the cached next steps.
+        """
+        if self.__store_paths is None or self.__store_paths[0] is not self.rooms:
+            stores = self.get_map_info()['stores']
+            self.__store_paths = (self.rooms, nearest_targets(self.rooms, stores))
+        return follow(self.__store_paths[1], tuple(start))
+
+    def create_world(self, seed=None, size=25, room_limit=150, use_numpy=False,
+                     chunk_size=None, max_chunks=64):
+        """
+        Generates a new map for the world.
+
+        chunk_size → rooms are built lazily, one chunk at a time
+                     (see `ChunkedRooms`), instead of all at once.
+        """
         if seed:
             self.map_seed = seed
-        map = Map(25, 150)
+        map = Map(size, room_limit, use_numpy)
         self.map_seed = map.generate_grid(map_seed=self.map_seed)
-        self.rooms = map.generate_rooms(self)
+        if chunk_size:
+            self.rooms = ChunkedRooms(self, map, chunk_size, max_chunks)
+        else:
+            self.rooms = map.generate_rooms(self)
+            self.link_rooms()
+
+    def link_rooms(self):
+        """
+        Links every room to its neighbors (see `Room.link_exits`).
+
+        The map doesn't change after it is built, so this only
+        needs to run when `self.rooms` is replaced.
+        """
+        for room in self.rooms.values():
+            room.link_exits(self.rooms)
 
     def save_to_db(self, DB):
         """
-        Erases all world/room/item data and resaves.
+        Erases this world's room data and resaves it in one transaction.
+        Other worlds are left alone.
+
+        Room ids come from a block reserved with `reserve_ids` (chunked
+        worlds keep theirs, see `ChunkedRooms.first_room_id`) and item
+        ids from `item_ids`, instead of from the database, so each table
+        is written with batched INSERTs and nothing has to be read back.
+        Without ids reserved from the DB, items in the game are
+        renumbered to match their new rows.
 
-        User data is preserved.
+        User data, and the items players are holding, is preserved.
         """
-        print(len(self.rooms))
-        Items.__table__.drop(DB.engine, checkfirst=True)
-        Worlds.__table__.drop(DB.engine, checkfirst=True)
-        Rooms.__table__.drop(DB.engine, checkfirst=True)
-        Worlds.__table__.create(DB.engine)
-        Rooms.__table__.create(DB.engine)
-        Users.__table__.create(DB.engine, checkfirst=True)
-        Items.__table__.create(DB.engine)
-
-        new_world = Worlds(self.password_salt, self.map_seed)
-        DB.session.add(new_world)
-        print(new_world)
-        DB.session.commit()
-        print(new_world.id)
-        items = []
-
-        for r in self.rooms.values():
-            new_room = Rooms(r.name, r.description,
-                             r.world_loc[0], r.world_loc[1])
-            print(new_room)
-            DB.session.add(new_room)
+        if self.item_writer is not None:
+            # Queued changes use the old item ids. Write them first
+            self.item_writer.flush()
+        # Before anything is written, as reserve_ids() commits on its own connection
+        chunked  = isinstance(self.rooms, ChunkedRooms)
+        settings = self.rooms.settings() if chunked else {}
+        first_id = None if chunked else reserve_ids(Rooms, len(self.rooms))
+        try:
+            db_world = None
+            if self.id is not None:
+                db_world = Worlds.query.filter_by(id=self.id).first()
+            if db_world is None:
+                db_world = Worlds(self.password_salt, self.map_seed)
+                db_world.id = self.id
+                DB.session.add(db_world)
+                DB.session.flush()
+                self.id = db_world.id
+                sync_id_sequence(Worlds)
+            else:
+                db_world.password_salt = self.password_salt
+                db_world.map_seed      = self.map_seed
+            for column in ['size', 'room_limit', 'chunk_size', 'max_chunks', 'first_room_id']:
+                setattr(db_world, column, settings.get(column))
+
+            own_rooms = DB.session.query(Rooms.id).filter(Rooms.world_id == self.id)
+            Items.query.filter(Items.room_id.in_(own_rooms)).delete(
+                synchronize_session=False)
+            Rooms.query.filter(Rooms.world_id == self.id).delete(synchronize_session=False)
+
+            if chunked:
+                # Chunks are written to the DB as they are first loaded
+                self.rooms.unload_all()
+            else:
+                # Other worlds' rooms keep their ids
+                for room_id, r in enumerate(self.rooms.values(), start=first_id):
+                    r.id = room_id
+                rooms_to_db(self.rooms.values(), renumber=not self.item_ids.shared)
             DB.session.commit()
-            print(new_room.id)
-            for i in r.items.values():
-                new_item = Items(i.name, i.weight, i.score,
-                                 room_id=new_room.id)
-                items.append(new_item)
+        except Exception:
+            DB.session.rollback()
+            raise
+        self.clear_dirty()
 
-        DB.session.bulk_save_objects(items)
-        DB.session.commit()
+    def flush_changes(self, DB):
+        """
+        Writes only what changed since the last save/flush:
+            - items dropped in rooms      → upserted with the room's id
+            - items picked up by players  → upserted with the player's id
+            - player location/highscore   → one batched users UPDATE
+
+        Item ids stay the same, so live Room/Player items remain valid.
 
-    def load_from_db(self, DB):
+        Returns the number of rows written.
         """
-        Loads all Rooms and any associated items from the database
-        into the game, if they exist.
+        item_rows, user_rows = [], []
+
+        for room in self.dirty_rooms:
+            for item_id in room.dirty_items:
+                # Items since taken by a player are written with the player
+                item = room.items.get(item_id)
+                if item is not None:
+                    item_rows.append(item_row(item, room_id=room.id))
+
+        for player in self.dirty_players:
+            for item_id in player.dirty_items:
+                item = player.items.get(item_id)
+                if item is not None:
+                    item_rows.append(item_row(item, player_id=player.id))
+            if player.user_changed:
+                user_rows.append({
+                    '_id': player.id,
+                    'x': player.world_loc[0],
+                    'y': player.world_loc[1],
+                    'highscore': player.highscore
+                })
+
+        try:
+            upsert(Items, item_rows)
+            if user_rows:
+                users = Users.__table__
+                DB.session.execute(
+                    users.update().where(users.c.id == DB.bindparam('_id')),
+                    user_rows)
+            DB.session.commit()
+        except Exception:
+            DB.session.rollback()
+            raise
+        self.clear_dirty()
+        return len(item_rows) + len(user_rows)
+
+    def clear_dirty(self):
+        for room in self.dirty_rooms:
+            room.clear_dirty()
+        for player in self.dirty_players:
+            player.clear_dirty()
+        self.dirty_rooms   = set()
+        self.dirty_players = set()
+
+    def load_from_db(self, DB, eager=True):
+        """
+        Loads the world with this world's id (or the first world,
+        if there's no such row) from the database into the game,
+        with its rooms, their items and its highscores.
+
+        eager=True  → one query for rooms, one for all room items,
+                      grouped by room in memory.
+        eager=False → walks each room's lazy `items` relationship,
+                      one query per room.
+
+        Chunked worlds get a new ChunkedRooms from the map seed and
+        their saved settings instead. Chunks already in the DB are
+        read from there as they're loaded, the rest are generated.
 
         This function does NOT load any players. Use `add_player()`
         or `load_player_from_db()` to load players into the game.
         """
-        db_worlds = Worlds.query.all()
-        if db_worlds is None or len(db_worlds) == 0:
+        if self.item_writer is not None:
+            self.item_writer.flush()
+        db_world = Worlds.query.filter_by(id=self.id).first() if self.id else None
+        first_world = Worlds.query.order_by(Worlds.id).first()
+        db_world = db_world or first_world
+        if db_world is None:
             DB.session.commit()
             return
-        self.password_salt = db_worlds[0].password_salt
-        self.map_seed = db_worlds[0].map_seed
+        self.id = db_world.id
+        self.password_salt = db_world.password_salt
+        self.map_seed = db_world.map_seed
+        if db_world is first_world:
+            # Rows from before there were several worlds belong to the first one
+            for model in [Rooms, Users]:
+                model.query.filter(model.world_id.is_(None)).update(
+                    {'world_id': self.id}, synchronize_session=False)
 
         self.rooms = {}
         self.players = {}
+        self.players_by_username = {}
+        self.clear_dirty()
+
+        if db_world.chunk_size:
+            map = Map(db_world.size, db_world.room_limit)
+            map.generate_grid(map_seed=self.map_seed)
+            self.rooms = ChunkedRooms(self, map, db_world.chunk_size, db_world.max_chunks or 64,
+                                      db_world.first_room_id)
+        else:
+            if eager:
+                self.rooms = rooms_from_db(self)
+            else:
+                for r in Rooms.query.filter_by(world_id=self.id):
+                    items = {i.id: db_to_class(i) for i in r.items}
+                    room = room_db_to_class(self, r, items)
+                    self.rooms[room.world_loc] = room
+            self.link_rooms()
 
-        for r in Rooms.query.all():
-            world_loc = (r.x, r.y)
-            items = {i.id: db_to_class(i) for i in r.items}
-            room = room_db_to_class(self, r, items)
-
-            self.rooms[room.world_loc] = room
-
+        self.leaderboard.load_from_db(Users.world_id == self.id)
         self.loaded = True
         DB.session.commit()
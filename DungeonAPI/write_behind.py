@@ -0,0 +1,90 @@
+import atexit
+import logging
+from threading import Event, Lock
+
+from .models import update_items_db
+
+logger = logging.getLogger(__name__)
+
+
+class ItemWriter:
+    """
+    Write-behind queue for item ownership changes.
+
+    Players taking/dropping/bartering items call `put()`, which only
+    records the item's new owner. A single background task writes every
+    pending change with `update_items_db` when:
+        - `flush_interval` seconds have passed, or
+        - `batch_size` changes are waiting.
+
+    Changes are coalesced by item id, so an item picked up and dropped
+    between flushes is written once, with its latest owner.
+
+    If `max_pending` changes are waiting (the DB can't keep up),
+    `put()` flushes in the caller instead of queueing more.
+    """
+
+    def __init__(self, app, flush_interval=0.5, batch_size=200, max_pending=5000):
+        self.app            = app
+        self.flush_interval = flush_interval
+        self.batch_size     = batch_size
+        self.max_pending    = max_pending
+        # pending { key: item id, value: (player_id, room_id) }
+        self.pending        = {}
+        self.running        = False
+        self.__lock         = Lock()  # Guards `pending`
+        self.__write_lock   = Lock()  # Keeps flushes in order
+        self.__wake         = Event()
+
+    def start(self, socketio):
+        """
+        Starts the background writer with socketio's async mode
+        (a greenlet under eventlet, a thread otherwise).
+
+        Pending changes are flushed when the process exits.
+        """
+        if self.running:
+            return
+        self.running = True
+        # An Event of the async mode, so waiting on it yields to eventlet
+        # even when the standard library isn't monkey patched
+        self.__wake  = socketio.server.eio.create_event()
+        socketio.start_background_task(self.__run)
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stops the background writer and flushes anything pending."""
+        self.running = False
+        self.__wake.set()
+        self.flush()
+
+    def put(self, item_ids, player_id, room_id):
+        """Queues the given items to be owned by the player/room."""
+        with self.__lock:
+            for item_id in item_ids:
+                self.pending[item_id] = (player_id, room_id)
+            pending = len(self.pending)
+
+        if pending >= self.max_pending or not self.running:
+            # Backpressure: no room left (or no writer), so write now
+            self.flush()
+        elif pending >= self.batch_size:
+            self.__wake.set()
+
+    def flush(self):
+        """Writes every pending change. Returns the number of items written."""
+        with self.__write_lock:
+            with self.__lock:
+                owners, self.pending = self.pending, {}
+            update_items_db(self.app, owners)
+        return len(owners)
+
+    def __run(self):
+        while self.running:
+            self.__wake.wait(self.flush_interval)
+            self.__wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Keep the writer alive. Changes are re-sent on the next full save
+                logger.exception("Writing item changes failed")
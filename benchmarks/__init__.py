@@ -0,0 +1,19 @@
+"""
+Benchmarks for the DungeonAPI server.
+
+Each module is runnable from the root directory, e.g.:
+"python -m benchmarks.world_persistence --rooms 10000"
+
+Importing DungeonAPI boots the app, so unless DATABASE_URL is
+already set, it is pointed at a throwaway SQLite database here.
+"""
+import os
+import tempfile
+
+if 'DATABASE_URL' not in os.environ:
+    _fd, _path = tempfile.mkstemp(suffix=".db", prefix="dungeon-bench-")
+    os.close(_fd)
+    os.environ['DATABASE_URL'] = f"sqlite:///{_path}"
+
+os.environ.setdefault('ADMIN_USERNAME', 'benchadmin')
+os.environ.setdefault('ADMIN_PASSWORD', 'benchpassword')
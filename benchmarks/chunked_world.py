@@ -0,0 +1,70 @@
+"""
+Compares building a whole world up front with a chunked world
+(World.create_world(chunk_size=...)) that loads rooms as they're visited.
+
+"python -m benchmarks.chunked_world --size 1000 --rooms 100000"
+"""
+import argparse
+import random
+import tracemalloc
+
+from DungeonAPI.models import DB
+from DungeonAPI.player import Player
+from DungeonAPI.world import World
+
+from .utils import make_app, timed
+
+
+def walk(world, moves):
+    """Walks one player around the world `moves` times."""
+    player = Player(world, 1, "walker", next(iter(world.rooms)), b"")
+    world.players[player.auth_key] = player
+    random.seed(0)
+    for _ in range(moves):
+        player.travel(random.choice(player.current_room.directions))
+    world.players.pop(player.auth_key)
+
+
+def run(size, room_limit, moves, chunk_size, max_chunks, database_url=None):
+    app = make_app(database_url)
+    results = []
+    with app.app_context():
+        for chunked in (False, True):
+            world = World()
+            tracemalloc.start()
+            create_seconds, _ = timed(
+                world.create_world, 16358, size, room_limit, True,
+                chunk_size if chunked else None, max_chunks)
+            save_seconds, _ = timed(world.save_to_db, DB)
+            walk_seconds, _ = timed(walk, world, moves)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({
+                'mode': 'chunked' if chunked else 'eager',
+                'rooms': len(world.rooms),
+                'create_seconds': round(create_seconds, 3),
+                'save_seconds': round(save_seconds, 3),
+                'walk_seconds': round(walk_seconds, 3),
+                'peak_mb': round(peak / 2**20, 1)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--moves', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=32)
+    parser.add_argument('--max-chunks', type=int, default=64)
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args()
+
+    for r in run(args.size, args.rooms, args.moves, args.chunk_size,
+                 args.max_chunks, args.database):
+        print(f"{r['mode']:>7} {r['rooms']} rooms: create {r['create_seconds']}s, "
+              f"save {r['save_seconds']}s, walk {r['walk_seconds']}s, peak {r['peak_mb']} MB")
+
+
+if __name__ == '__main__':
+    main()
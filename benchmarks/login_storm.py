@@ -0,0 +1,143 @@
+"""
+Logs many players in at once while another player keeps moving,
+and reports login throughput and how long `move` events stalled.
+
+Runs once with bcrypt in the socket handler ("inline") and once
+with the PasswordHasher pool ("pooled"). The event loop is eventlet,
+like the Procfile's single gunicorn worker.
+
+"python -m benchmarks.login_storm --logins 32 --concurrency 8 --output results.json"
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import random
+from time import perf_counter
+
+from DungeonAPI import APP, socketio
+from DungeonAPI.passwords import PasswordHasher
+
+from .utils import summarize, write_json
+
+PASSWORD = "benchpassword"
+
+
+def register(username):
+    client = socketio.test_client(APP)
+    client.emit('register', {'username': username,
+                             'password1': PASSWORD,
+                             'password2': PASSWORD})
+    client.disconnect()
+
+
+def login_worker(usernames, latencies):
+    """Logs in as each user in turn, recording each login's latency."""
+    client = socketio.test_client(APP)
+    for username in usernames:
+        start = perf_counter()
+        # After the first login the user is already online, but the
+        # password is still checked before that's rejected
+        client.emit('login', {'username': username, 'password': PASSWORD})
+        latencies.append(perf_counter() - start)
+        client.get_received()
+    client.disconnect()
+
+
+def mover(done, latencies):
+    """
+    Moves around until `done`, recording how long each move took to come
+    round again. Any time the event loop spends stuck in bcrypt shows up here.
+    """
+    client = socketio.test_client(APP)
+    client.emit('register', {'username': f"mover-{random.randint(0, 10**8)}",
+                             'password1': PASSWORD,
+                             'password2': PASSWORD})
+    client.emit('init')
+    room = None
+    last = perf_counter()
+    while not done:
+        for packet in client.get_received():
+            if packet['name'] == 'roomupdate' and packet['args'][0]['room']:
+                room = packet['args'][0]['room']
+        client.emit('move', random.choice(room['direction']))
+        # Yield so the logins get their turn
+        eventlet.sleep(0.001)
+        now = perf_counter()
+        latencies.append(now - last)
+        last = now
+    client.disconnect()
+
+
+def run_storm(hasher, usernames, logins, concurrency):
+    for world in APP.extensions['dungeon_worlds']:
+        world.hasher = hasher
+
+    move_latencies  = []
+    login_latencies = []
+    done = []
+    mover_thread = eventlet.spawn(mover, done, move_latencies)
+    eventlet.sleep(0.05)
+
+    per_worker = [[usernames[(w + i * concurrency) % len(usernames)]
+                   for i in range(logins // concurrency)]
+                  for w in range(concurrency)]
+    start = perf_counter()
+    pool = eventlet.GreenPool(concurrency)
+    for names in per_worker:
+        pool.spawn(login_worker, names, login_latencies)
+    pool.waitall()
+    seconds = perf_counter() - start
+
+    done.append(True)
+    mover_thread.wait()
+
+    moves = summarize(move_latencies)
+    moves['max_ms'] = round(max(move_latencies) * 1000, 3)
+    return {
+        'logins': {**summarize(login_latencies),
+                   'per_second': round(len(login_latencies) / seconds, 2)},
+        'moves': moves
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=12, help="bcrypt cost")
+    parser.add_argument('--output', default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    random.seed(0)
+    usernames = [f"storm{i}-{random.randint(0, 10**8)}" for i in range(args.users)]
+    hasher = PasswordHasher(rounds=args.rounds)
+    for world in APP.extensions['dungeon_worlds']:
+        world.hasher = hasher
+    for username in usernames:
+        register(username)
+
+    results = {
+        'logins': args.logins,
+        'concurrency': args.concurrency,
+        'rounds': args.rounds,
+        'inline': run_storm(PasswordHasher(0, args.rounds), usernames,
+                            args.logins, args.concurrency),
+        'pooled': run_storm(PasswordHasher(rounds=args.rounds), usernames,
+                            args.logins, args.concurrency)
+    }
+
+    for mode in ['inline', 'pooled']:
+        logins, moves = results[mode]['logins'], results[mode]['moves']
+        print(f"{mode:>6}: {logins['per_second']} logins/s "
+              f"(p50 {logins['p50_ms']}ms), {moves['count']} moves, "
+              f"gap between moves p50 {moves['p50_ms']}ms, p99 {moves['p99_ms']}ms, "
+              f"max {moves['max_ms']}ms")
+
+    if args.output:
+        write_json(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Compares the size and encoding time of the 'init' payloads
+('mapinfo' and the room snapshot) sent as JSON and as the compact
+encoding clients get with "?encoding=compact".
+
+Sizes and times are for whole Socket.IO packets, as the server
+writes them: JSON text plus any binary attachments.
+
+"python -m benchmarks.map_encoding --rooms 10000 --repeat 20"
+"""
+import argparse
+from time import perf_counter
+
+from socketio import packet
+
+from DungeonAPI.encoding import pack_map, unpack_map, pack_room
+
+from .utils import build_world
+
+
+def encode(event, payload):
+    """Returns (bytes on the wire, the encoded packet parts)."""
+    encoded = packet.Packet(packet.EVENT, data=[event, payload]).encode()
+    parts = encoded if isinstance(encoded, list) else [encoded]
+    size = sum(len(p.encode() if isinstance(p, str) else p) for p in parts)
+    return size, parts
+
+
+def measure(event, build, repeat):
+    """Builds and encodes a payload `repeat` times. Returns (bytes, ms per call)."""
+    start = perf_counter()
+    for _ in range(repeat):
+        size, _ = encode(event, build())
+    return size, round((perf_counter() - start) / repeat * 1000, 3)
+
+
+def run(room_count, repeat):
+    world = build_world(room_count)
+    map_info = world.get_map_info()
+    assert sorted(unpack_map(pack_map(map_info))['rooms']) == sorted(map_info['rooms'])
+
+    room = max(world.rooms.values(), key=lambda r: len(r.items))
+    payloads = {
+        'mapinfo': {
+            'json': lambda: world.get_map_info(),
+            # Cached per world, so only the first call packs the map
+            'compact': lambda: world.get_packed_map_info(),
+            'compact_uncached': lambda: pack_map(world.get_map_info())
+        },
+        'roomupdate': {
+            'json': lambda: {'room': room.serialize(), 'chat': None},
+            'compact': lambda: {'room': pack_room(room.serialize()), 'chat': None}
+        }
+    }
+    results = {'rooms': len(world.rooms), 'room_items': len(room.items)}
+    for event, encodings in payloads.items():
+        results[event] = {}
+        for name, build in encodings.items():
+            size, ms = measure(event, build, repeat)
+            results[event][name] = {'bytes': size, 'ms': ms}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    results = run(args.rooms, args.repeat)
+    print(f"{results['rooms']} rooms, snapshot of a room with {results['room_items']} items")
+    for event in ['mapinfo', 'roomupdate']:
+        json_bytes = results[event]['json']['bytes']
+        for name, result in results[event].items():
+            print(f"{event:>10} {name:>16}: {result['bytes']:>8} bytes "
+                  f"({result['bytes'] / json_bytes:.1%}), {result['ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
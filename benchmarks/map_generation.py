@@ -0,0 +1,43 @@
+"""
+Compares Map generation with the list-of-lists grid
+and with the NumPy grid (Map(..., use_numpy=True)).
+
+"python -m benchmarks.map_generation --size 1000 --rooms 100000"
+"""
+import argparse
+
+from DungeonAPI.map import Map
+
+from .utils import timed
+
+
+def run(size, room_limit, seed=16358):
+    results = []
+    for use_numpy in (False, True):
+        map = Map(size, room_limit, use_numpy)
+        grid_seconds, _ = timed(map.generate_grid, map_seed=seed)
+        rooms_seconds, rooms = timed(map.generate_rooms)
+        results.append({
+            'mode': 'numpy' if use_numpy else 'python',
+            'size': size,
+            'rooms': len(rooms),
+            'grid_seconds': round(grid_seconds, 4),
+            'rooms_seconds': round(rooms_seconds, 4)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--rooms', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=16358)
+    args = parser.parse_args()
+
+    for result in run(args.size, args.rooms, args.seed):
+        print(f"{result['mode']:>6} {result['size']}x{result['size']}, {result['rooms']} rooms: "
+              f"grid {result['grid_seconds']}s, rooms {result['rooms_seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Reports memory used per item, per room and per player, with the
+classes' __slots__ (and shared item names/descriptions) and with
+the same objects laid out the way they were before: every attribute,
+item names and descriptions included, in an instance __dict__.
+
+Both layouts are measured as copies of the same world, items and
+players. Copies share attribute values (strings, sets, ...), so only
+the objects themselves, and each room's items, are counted.
+
+"python -m benchmarks.memory --items 100000 --rooms 10000"
+"""
+import argparse
+import copy
+import gc
+import random
+import tracemalloc
+
+from DungeonAPI.item import Trash, Stick, Gem, Hammer
+from DungeonAPI.player import Player
+
+from .utils import build_world
+
+
+def measure(build):
+    """Returns (bytes allocated by build() and still alive, its return value)."""
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    value = build()
+    gc.collect()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return after - before, value
+
+
+def slot_names(cls):
+    """Every slot of the class and its bases, with private names mangled."""
+    names = []
+    for klass in reversed(cls.__mro__):
+        for name in getattr(klass, '__slots__', ()):
+            if name.startswith('__') and not name.endswith('__'):
+                name = f"_{klass.__name__.lstrip('_')}{name}"
+            names.append(name)
+    return names
+
+
+class DictBacked:
+    """Copies an object's slots into an instance __dict__, in the same order."""
+
+    def __init__(self, obj):
+        for name in slot_names(type(obj)):
+            if hasattr(obj, name):
+                setattr(self, name, getattr(obj, name))
+
+
+class DictItem(DictBacked):
+    """An Item before __slots__, with its own name and description."""
+
+    def __init__(self, item):
+        self.name        = item.name
+        self.description = item.description
+        super().__init__(item)
+
+
+class DictRoom(DictBacked):
+    pass
+
+
+class DictPlayer(DictBacked):
+    pass
+
+
+def copy_room(room, copy_object, copy_item):
+    clone = copy_object(room)
+    clone.items = {id: copy_item(item) for id, item in room.items.items()}
+    return clone
+
+
+def build_items(count):
+    item_classes = [Trash, Stick, Gem, Hammer]
+    return [random.choice(item_classes)(i) for i in range(1, count + 1)]
+
+
+def build_players(world, count):
+    start = next(iter(world.rooms))
+    return [Player(world, i, f"player{i}", start, b"") for i in range(count)]
+
+
+def run(item_count, room_count, player_count):
+    random.seed(0)
+    items   = build_items(item_count)
+    world   = build_world(room_count)
+    rooms   = list(world.rooms.values())
+    players = build_players(world, player_count)
+    world_items = sum(len(r.items) for r in rooms)
+
+    layouts = [
+        ('dict', DictItem, DictRoom, DictPlayer),
+        ('slots', copy.copy, copy.copy, copy.copy)
+    ]
+    results = []
+    for layout, copy_item, copy_room_object, copy_player in layouts:
+        item_bytes, _   = measure(lambda: [copy_item(i) for i in items])
+        room_bytes, _   = measure(lambda: [copy_room(r, copy_room_object, copy_item) for r in rooms])
+        player_bytes, _ = measure(lambda: [copy_player(p) for p in players])
+        results.append({
+            'layout': layout,
+            'bytes_per_item': round(item_bytes / item_count),
+            'bytes_per_room': round(room_bytes / len(rooms)),
+            'items_per_room': round(world_items / len(rooms), 1),
+            'bytes_per_player': round(player_bytes / player_count)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=10000)
+    args = parser.parse_args()
+
+    for result in run(args.items, args.rooms, args.players):
+        print(f"{result['layout']:>5}: {result['bytes_per_item']} bytes per item, "
+              f"{result['bytes_per_room']} bytes per room "
+              f"(including its {result['items_per_room']} items), "
+              f"{result['bytes_per_player']} bytes per player")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Measures Player.travel moves/second, with rooms linked to their
+neighbors (World.link_rooms) and with plain coordinate lookups.
+
+"python -m benchmarks.movement --rooms 150 10000 --moves 200000"
+"""
+import argparse
+import random
+
+from DungeonAPI.player import Player
+
+from .utils import build_world, timed
+
+
+def walk(player, moves):
+    """Moves the player in a random open direction `moves` times."""
+    for _ in range(moves):
+        player.travel(random.choice(player.current_room.directions))
+
+
+def run(room_counts, moves):
+    results = []
+    for room_count in room_counts:
+        world = build_world(room_count)
+        for linked in (False, True):
+            if not linked:
+                for room in world.rooms.values():
+                    room.exits = None
+            else:
+                world.link_rooms()
+            start = next(iter(world.rooms))
+            player = Player(world, 1, "walker", start, b"")
+            random.seed(0)
+            seconds, _ = timed(walk, player, moves)
+            results.append({
+                'mode': 'adjacency' if linked else 'coordinates',
+                'rooms': len(world.rooms),
+                'moves': moves,
+                'moves_per_second': round(moves / seconds)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[150, 10000])
+    parser.add_argument('--moves', type=int, default=200000)
+    args = parser.parse_args()
+
+    for result in run(args.rooms, args.moves):
+        print(f"{result['mode']:>11} {result['rooms']:>7} rooms: "
+              f"{result['moves_per_second']} moves/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Seeds a SQLite database with more and more items, and reports the
+query plan and time of the lookups on the login, save, inventory
+reset and chunk loading paths, with and without the models' indexes.
+
+Each step grows the tables 10x: items, rooms (1 per 10 items)
+and users (1 per 100 items).
+
+"python -m benchmarks.query_plans --items 1000000 --steps 4 --output results.json"
+"""
+import argparse
+import os
+import random
+import tempfile
+from time import perf_counter
+
+from DungeonAPI.models import DB, Users, Rooms, Items
+
+from .utils import make_app, write_json
+
+INDEXES = ['ix_users_username', 'ix_rooms_world_id_x_y',
+           'ix_items_player_id', 'ix_items_room_id']
+
+# Keys per lookup, like the code paths that run them
+BATCH = 50
+
+
+def lookups(counts):
+    """{ key: name, value: function returning a query with random keys }"""
+    users, rooms, items = counts['users'], counts['rooms'], counts['items']
+    side = int(rooms ** 0.5)
+    return {
+        # World.load_player_from_db(), add_player()
+        'login': lambda: Users.query.filter_by(
+            username=f"user{random.randrange(users)}"),
+        # World.save_players_to_db() clearing held items
+        'save': lambda: DB.session.query(Items.id).filter(
+            Items.player_id.in_(random.sample(range(1, users + 1), BATCH))),
+        # reset_inventories() deleting a batch of rooms' items
+        'reset': lambda: DB.session.query(Items.id).filter(
+            Items.room_id.in_(random.sample(range(1, rooms + 1), BATCH))),
+        # upsert() / ItemWriter by item id
+        'item_ids': lambda: DB.session.query(Items.id).filter(
+            Items.id.in_(random.sample(range(1, items + 1), BATCH))),
+        # ChunkedRooms loading a 16x16 chunk
+        'chunk': lambda: chunk_query(random.randrange(side), random.randrange(side))
+    }
+
+
+def chunk_query(x, y, size=16):
+    return DB.session.query(Rooms.id).filter(
+        Rooms.world_id == 1,
+        Rooms.x >= x, Rooms.x < x + size,
+        Rooms.y >= y, Rooms.y < y + size)
+
+
+def seed(counts, start):
+    """Inserts rows until the tables hold `counts`, from the `start` counts."""
+    side = int(counts['rooms'] ** 0.5) + 1
+    DB.session.execute(Users.__table__.insert(), [
+        {'id': i, 'username': f"user{i - 1}", 'password_hash': b'x', 'admin_q': False,
+         'x': 0, 'y': 0, 'highscore': 0, 'world_id': 1}
+        for i in range(start['users'] + 1, counts['users'] + 1)])
+    DB.session.execute(Rooms.__table__.insert(), [
+        {'id': i, 'name': 'room', 'description': None,
+         'x': i % side, 'y': i // side, 'world_id': 1}
+        for i in range(start['rooms'] + 1, counts['rooms'] + 1)])
+    chunk = 100000
+    for first in range(start['items'] + 1, counts['items'] + 1, chunk):
+        last = min(first + chunk, counts['items'] + 1)
+        DB.session.execute(Items.__table__.insert(), [
+            # Most items lie in rooms, the rest are held by players
+            {'id': i, 'name': 'Stick', 'weight': 1, 'score': 1,
+             'player_id': random.randint(1, counts['users']) if i % 10 == 0 else None,
+             'room_id': None if i % 10 == 0 else random.randint(1, counts['rooms'])}
+            for i in range(first, last)])
+    DB.session.commit()
+
+
+def plan(query):
+    """Returns the EXPLAIN QUERY PLAN details of a query."""
+    sql = str(query.statement.compile(dialect=DB.engine.dialect,
+                                      compile_kwargs={'literal_binds': True}))
+    return "; ".join(row[-1] for row in DB.session.execute(DB.text(f"EXPLAIN QUERY PLAN {sql}")))
+
+
+def measure(counts, repeat):
+    """Returns { key: lookup, value: {'plan', 'ms'} } for the current indexes."""
+    results = {}
+    for name, build in lookups(counts).items():
+        query = build()
+        query.all()  # Warm the page cache
+        start = perf_counter()
+        for _ in range(repeat):
+            build().all()
+        results[name] = {
+            'plan': plan(query),
+            'ms': round((perf_counter() - start) / repeat * 1000, 3)
+        }
+    return results
+
+
+def set_indexes(enabled):
+    for model in [Users, Rooms, Items]:
+        for index in model.__table__.indexes:
+            if index.name in INDEXES:
+                if enabled:
+                    index.create(DB.engine)
+                else:
+                    index.drop(DB.engine)
+
+
+def run(max_items, steps, repeat, indexes_off=True):
+    fd, path = tempfile.mkstemp(suffix=".db", prefix="dungeon-plans-")
+    os.close(fd)
+    app = make_app(f"sqlite:///{path}")
+    results = []
+    counts = {'users': 0, 'rooms': 0, 'items': 0}
+    with app.app_context():
+        for step in range(steps - 1, -1, -1):
+            items = max_items // 10 ** step
+            start, counts = counts, {'users': max(items // 100, BATCH),
+                                     'rooms': max(items // 10, BATCH),
+                                     'items': items}
+            seed(counts, start)
+            DB.session.execute(DB.text("ANALYZE"))
+            result = {**counts, 'indexed': measure(counts, repeat)}
+            if indexes_off:
+                set_indexes(False)
+                result['unindexed'] = measure(counts, max(repeat // 10, 1))
+                set_indexes(True)
+            results.append(result)
+    os.remove(path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=1000000)
+    parser.add_argument('--steps', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=100)
+    parser.add_argument('--indexed-only', action='store_true',
+                        help="skip timing the lookups without indexes")
+    parser.add_argument('--output', default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    random.seed(0)
+    results = run(args.items, args.steps, args.repeat, not args.indexed_only)
+    for result in results:
+        print(f"{result['items']} items, {result['rooms']} rooms, {result['users']} users")
+        for name, indexed in result['indexed'].items():
+            line = f"  {name:>8}: {indexed['ms']:>8}ms"
+            if 'unindexed' in result:
+                line += f" (without indexes {result['unindexed'][name]['ms']}ms)"
+            print(f"{line}  {indexed['plan']}")
+
+    if args.output:
+        write_json(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
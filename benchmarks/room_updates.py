@@ -0,0 +1,105 @@
+"""
+Compares how many bytes room updates cost a client that gets full
+"roomupdate" snapshots and one that asked for "roomdelta" updates.
+
+Both watch the same room while another player takes and drops its
+items and walks out and back in. Bytes are the JSON size of each
+event's arguments, as a client would receive them.
+
+"python -m benchmarks.room_updates --actions 200 --output results.json"
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import random
+
+from DungeonAPI import APP, socketio
+from DungeonAPI.room import Store
+
+from .utils import write_json
+
+PASSWORD = "benchpassword"
+
+
+def join(username, loc, deltas):
+    """Registers a player, puts them in the room at `loc` and inits them."""
+    client = socketio.test_client(APP)
+    client.emit('register', {'username': username,
+                             'password1': PASSWORD,
+                             'password2': PASSWORD})
+    APP.extensions['dungeon_worlds'].get_player_by_username(username).world_loc = loc
+    client.emit('init', {'deltas': deltas})
+    client.get_received()
+    return client
+
+
+def received(client):
+    """Returns { key: event name, value: [events, bytes] } since the last call."""
+    totals = {}
+    for packet in client.get_received():
+        counts = totals.setdefault(packet['name'], [0, 0])
+        counts[0] += 1
+        counts[1] += len(json.dumps(packet['args']))
+    return totals
+
+
+def busiest_room(world):
+    rooms = [r for r in world.rooms.values()
+             if not isinstance(r, Store) and r.get_room_in_direction('n')]
+    return max(rooms, key=lambda r: len(r.items))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--actions', type=int, default=200)
+    parser.add_argument('--output', default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    random.seed(0)
+    suffix = random.randint(0, 10**8)
+    world  = APP.extensions['dungeon_worlds'].main
+    room   = busiest_room(world)
+
+    full  = join(f"full-{suffix}", room.world_loc, deltas=False)
+    delta = join(f"delta-{suffix}", room.world_loc, deltas=True)
+    actor = join(f"actor-{suffix}", room.world_loc, deltas=True)
+    received(full), received(delta)
+
+    for i in range(args.actions):
+        if i % 10 == 9:
+            actor.emit('move', 'n')
+            actor.emit('move', 's')
+        else:
+            item_id = next(iter(room.items))
+            actor.emit('take', item_id)
+            actor.emit('drop', item_id)
+        actor.get_received()
+
+    results = {
+        'actions': args.actions,
+        'room_items': len(room.items),
+        'full': received(full),
+        'delta': received(delta)
+    }
+    full_bytes  = sum(b for _, b in results['full'].values())
+    delta_bytes = sum(b for _, b in results['delta'].values())
+    results['saved'] = round(1 - delta_bytes / full_bytes, 3)
+
+    print(f"{args.actions} actions in a room with {len(room.items)} items")
+    for mode in ['full', 'delta']:
+        events = ", ".join(f"{n} {name}" for name, (n, _) in results[mode].items())
+        total  = sum(b for _, b in results[mode].values())
+        print(f"{mode:>5}: {total} bytes ({events})")
+    print(f"deltas saved {results['saved'] * 100:.1f}%")
+
+    for client in [full, delta, actor]:
+        client.disconnect()
+
+    if args.output:
+        write_json(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Drives the app's socket events with many simulated players and
+reports throughput and p50/p99 latency per event type, along with
+world generation, save_to_db and load_from_db timings.
+
+Uses the app built by DungeonAPI/__init__.py and the Flask-SocketIO
+test client, against the SQLite database set up in benchmarks/__init__.py.
+
+"python -m benchmarks.socket_events --players 20 --rounds 50 --output results.json"
+"""
+import argparse
+import random
+from time import perf_counter
+
+from DungeonAPI import APP, socketio
+from DungeonAPI.models import DB
+from DungeonAPI.world import World
+
+from .utils import build_world, timed, summarize, write_json
+
+EVENTS = ["move", "take", "drop", "chat"]
+
+
+class SimulatedPlayer:
+    """A registered test client that remembers the last room it saw."""
+
+    def __init__(self, number, password="benchpassword"):
+        self.client = socketio.test_client(APP)
+        self.room   = None
+        username = f"bench{number}-{random.randint(0, 10**8)}"
+        self.client.emit('register', {'username': username,
+                                      'password1': password,
+                                      'password2': password})
+        self.client.emit('init')
+        self.read()
+
+    def read(self):
+        """Reads everything received, keeping the latest room info."""
+        for packet in self.client.get_received():
+            if packet['name'] == 'roomupdate' and packet['args'][0]['room']:
+                self.room = packet['args'][0]['room']
+
+    def emit(self, event, *args):
+        """Sends an event, returning the seconds it took the server to handle it."""
+        start = perf_counter()
+        self.client.emit(event, *args)
+        seconds = perf_counter() - start
+        self.read()
+        return seconds
+
+
+def play_round(player, latencies):
+    """move, take, drop and chat once each, recording their latencies."""
+    direction = random.choice(player.room['direction'])
+    latencies['move'].append(player.emit('move', direction))
+
+    if player.room['items'] and player.room['name'] != "Ant Store":
+        item_id = random.choice(player.room['items'])[1]['id']
+        latencies['take'].append(player.emit('take', item_id))
+        latencies['drop'].append(player.emit('drop', item_id))
+
+    latencies['chat'].append(player.emit('chat', "hello"))
+
+
+def run_events(player_count, rounds):
+    random.seed(0)
+    players = [SimulatedPlayer(i) for i in range(player_count)]
+    latencies = {event: [] for event in EVENTS}
+
+    start = perf_counter()
+    for _ in range(rounds):
+        for player in players:
+            play_round(player, latencies)
+    seconds = perf_counter() - start
+
+    for player in players:
+        player.client.disconnect()
+
+    results = {event: summarize(latencies[event]) for event in EVENTS}
+    total = sum(len(l) for l in latencies.values())
+    results['all'] = {'count': total, 'per_second': round(total / seconds)}
+    return results
+
+
+def run_world(room_count):
+    with APP.app_context():
+        generate_seconds, world = timed(build_world, room_count)
+        save_seconds, _ = timed(world.save_to_db, DB)
+        load_seconds, _ = timed(World().load_from_db, DB)
+    return {
+        'rooms': room_count,
+        'generate_seconds': round(generate_seconds, 4),
+        'save_seconds': round(save_seconds, 4),
+        'load_seconds': round(load_seconds, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--players', type=int, default=20)
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--rooms', type=int, default=150,
+                        help="room count for the world timings")
+    parser.add_argument('--output', default=None, help="write results as JSON here")
+    args = parser.parse_args()
+
+    results = {
+        'players': args.players,
+        'rounds': args.rounds,
+        'events': run_events(args.players, args.rounds),
+        'world': run_world(args.rooms)
+    }
+
+    for event in EVENTS:
+        stats = results['events'][event]
+        print(f"{event:>5}: {stats['count']:>6} events, {stats['per_second']}/s, "
+              f"p50 {stats['p50_ms']}ms, p99 {stats['p99_ms']}ms")
+    print(f"  all: {results['events']['all']['count']:>6} events, "
+          f"{results['events']['all']['per_second']}/s")
+    world = results['world']
+    print(f"world ({world['rooms']} rooms): generate {world['generate_seconds']}s, "
+          f"save {world['save_seconds']}s, load {world['load_seconds']}s")
+
+    if args.output:
+        write_json(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
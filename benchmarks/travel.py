@@ -0,0 +1,121 @@
+"""
+Compares walking to distant rooms with one 'move' event per step
+and with a single 'travel_to' event, counting the events sent,
+the packets and bytes the walker gets back, and the room emits.
+
+Also times World.find_path and World.path_to_store on a bigger map.
+
+"python -m benchmarks.travel --trips 50 --rooms 10000"
+"""
+import eventlet
+eventlet.monkey_patch()
+
+import argparse
+import json
+import random
+from time import perf_counter
+
+from DungeonAPI import APP, socketio
+
+from .utils import build_world, timed
+
+PASSWORD  = "benchpassword"
+DIRECTION = {(0, 1): 'n', (1, 0): 'e', (0, -1): 's', (-1, 0): 'w'}
+
+
+def walker(username):
+    client = socketio.test_client(APP)
+    client.emit('register', {'username': username,
+                             'password1': PASSWORD,
+                             'password2': PASSWORD})
+    client.emit('init')
+    client.get_received()
+    return client, APP.extensions['dungeon_worlds'].get_player_by_username(username)
+
+
+def trips(world, count, min_steps):
+    """Random (start, goal) pairs at least `min_steps` apart."""
+    locs = list(world.rooms.keys())
+    found = []
+    while len(found) < count:
+        start, goal = random.sample(locs, 2)
+        path = world.find_path(start, goal)
+        if path is not None and len(path) >= min_steps:
+            found.append((start, goal, path))
+    return found
+
+
+def run_trips(mode, trip_list):
+    client, player = walker(f"{mode}-{random.randint(0, 10**8)}")
+    metrics = APP.extensions['dungeon_metrics']
+    emits_before = sum(metrics.recipients.values())
+    sent = packets = size = 0
+    start_time = perf_counter()
+    for start, goal, path in trip_list:
+        player.world_loc = start
+        if mode == 'move':
+            previous = start
+            for loc in path:
+                client.emit('move', DIRECTION[(loc[0] - previous[0], loc[1] - previous[1])])
+                previous = loc
+                sent += 1
+        else:
+            client.emit('travel_to', {'x': goal[0], 'y': goal[1]})
+            sent += 1
+        assert player.world_loc == goal
+        for packet in client.get_received():
+            packets += 1
+            size    += len(json.dumps(packet['args']))
+    seconds = perf_counter() - start_time
+    client.disconnect()
+    return {
+        'events_sent': sent,
+        'packets_received': packets,
+        'bytes_received': size,
+        'room_emit_recipients': sum(metrics.recipients.values()) - emits_before,
+        'ms_per_trip': round(seconds / len(trip_list) * 1000, 3)
+    }
+
+
+def run_pathfinding(room_count, queries):
+    world = build_world(room_count)
+    pairs = [random.sample(list(world.rooms.keys()), 2) for _ in range(queries)]
+    seconds, _ = timed(lambda: [world.find_path(s, g) for s, g in pairs])
+    first_store, _ = timed(world.path_to_store, pairs[0][0])
+    store_seconds, _ = timed(lambda: [world.path_to_store(s) for s, _ in pairs])
+    return {
+        'rooms': len(world.rooms),
+        'find_path_ms': round(seconds / queries * 1000, 3),
+        'store_table_ms': round(first_store * 1000, 3),
+        'path_to_store_ms': round(store_seconds / queries * 1000, 4)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trips', type=int, default=50)
+    parser.add_argument('--min-steps', type=int, default=10)
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(0)
+    world = APP.extensions['dungeon_worlds'].main
+    trip_list = trips(world, args.trips, args.min_steps)
+    steps = sum(len(path) for _, _, path in trip_list)
+    print(f"{args.trips} trips, {steps} steps in a {len(world.rooms)} room world")
+    for mode in ['move', 'travel_to']:
+        result = run_trips(mode, trip_list)
+        print(f"{mode:>9}: {result['events_sent']} events sent, "
+              f"{result['packets_received']} packets / {result['bytes_received']} bytes back, "
+              f"{result['room_emit_recipients']} room emit recipients, "
+              f"{result['ms_per_trip']}ms per trip")
+
+    result = run_pathfinding(args.rooms, args.queries)
+    print(f"{result['rooms']} rooms: find_path {result['find_path_ms']}ms, "
+          f"store table {result['store_table_ms']}ms once, "
+          f"then path_to_store {result['path_to_store_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
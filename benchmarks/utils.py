@@ -0,0 +1,95 @@
+import json
+import math
+import os
+from contextlib import contextmanager
+from time import perf_counter
+
+from flask import Flask
+from sqlalchemy import event
+
+from DungeonAPI.models import DB, Worlds, Rooms, Users, Items, IdBlocks
+from DungeonAPI.world import World
+
+
+def make_app(database_url=None):
+    """
+    Returns a bare Flask app bound to `DB` with all tables created.
+
+    Without a database_url, the DATABASE_URL environment variable is used.
+    """
+    if database_url is None:
+        database_url = os.environ['DATABASE_URL']
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    DB.init_app(app)
+
+    with app.app_context():
+        Worlds.__table__.create(DB.engine, checkfirst=True)
+        Rooms.__table__.create(DB.engine, checkfirst=True)
+        Users.__table__.create(DB.engine, checkfirst=True)
+        Items.__table__.create(DB.engine, checkfirst=True)
+        IdBlocks.__table__.create(DB.engine, checkfirst=True)
+    return app
+
+
+def build_world(room_count, seed=16358):
+    """Generates a World with (about) `room_count` rooms."""
+    # Leave the walkers plenty of empty grid so they can reach the limit
+    size = max(25, math.ceil(math.sqrt(room_count * 3)))
+    world = World(map_seed=seed)
+    world.create_world(seed, size=size, room_limit=room_count)
+    return world
+
+
+def timed(func, *args, **kwargs):
+    """Calls func, returning (seconds taken, return value)."""
+    start = perf_counter()
+    value = func(*args, **kwargs)
+    return perf_counter() - start, value
+
+
+@contextmanager
+def count_queries(engine):
+    """
+    Counts the statements sent to the engine inside the `with` block.
+
+    Yields a one-item list holding the running count.
+    """
+    count = [0]
+
+    def before_cursor_execute(*_, **__):
+        count[0] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield count
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def percentile(values, percent):
+    """Returns the value below which `percent`% of the values fall (nearest rank)."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies):
+    """Turns a list of latencies in seconds into a stats dict."""
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'per_second': round(len(latencies) / total) if total else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3) if latencies else None
+    }
+
+
+def write_json(results, path):
+    """Writes results to path as JSON, to compare against other runs."""
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
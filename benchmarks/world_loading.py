@@ -0,0 +1,45 @@
+"""
+Compares World.load_from_db's eager and lazy loading modes.
+
+"python -m benchmarks.world_loading --rooms 150 10000"
+"""
+import argparse
+
+from DungeonAPI.models import DB
+from DungeonAPI.world import World
+
+from .utils import make_app, build_world, timed, count_queries
+
+
+def run(room_counts, database_url=None):
+    app = make_app(database_url)
+    results = []
+    with app.app_context():
+        for room_count in room_counts:
+            build_world(room_count).save_to_db(DB)
+            for eager in (False, True):
+                world = World()
+                with count_queries(DB.engine) as queries:
+                    seconds, _ = timed(world.load_from_db, DB, eager=eager)
+                results.append({
+                    'mode': 'eager' if eager else 'lazy',
+                    'rooms': len(world.rooms),
+                    'queries': queries[0],
+                    'load_seconds': round(seconds, 4)
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[150, 1000, 10000])
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args()
+
+    for result in run(args.rooms, args.database):
+        print(f"{result['mode']:>5} {result['rooms']:>7} rooms: "
+              f"{result['queries']:>6} queries, {result['load_seconds']:>8}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Measures how fast World.save_to_db writes a world of a given size.
+
+"python -m benchmarks.world_persistence --rooms 1000 10000 30000"
+"""
+import argparse
+
+from DungeonAPI.models import DB
+
+from .utils import make_app, build_world, timed
+
+
+def run(room_counts, database_url=None):
+    app = make_app(database_url)
+    results = []
+    with app.app_context():
+        for room_count in room_counts:
+            world = build_world(room_count)
+            item_count = sum(len(r.items) for r in world.rooms.values())
+            seconds, _ = timed(world.save_to_db, DB)
+            results.append({
+                'rooms': len(world.rooms),
+                'items': item_count,
+                'save_seconds': round(seconds, 4),
+                'rooms_per_second': round(len(world.rooms) / seconds)
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, nargs='+', default=[150, 1000, 10000])
+    parser.add_argument('--database', default=None)
+    args = parser.parse_args()
+
+    for result in run(args.rooms, args.database):
+        print(f"{result['rooms']:>7} rooms, {result['items']:>7} items: "
+              f"{result['save_seconds']:>8}s  ({result['rooms_per_second']} rooms/s)")
+
+
+if __name__ == '__main__':
+    main()